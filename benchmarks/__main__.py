@@ -0,0 +1,161 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Run benchmarks on synthetic Steam Libraries and report results."""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .stages import STAGES
+from .synthetic import generate_libraries, get_library_parser
+
+RESULT_VERSION = 1
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return parser for benchmark command line arguments."""
+    parser = get_library_parser(
+        "python -m benchmarks",
+        "Time ssdk stages on synthetic Steam Libraries.",
+        [10, 100, 1000],
+        libraries=True
+    )
+    parser.add_argument(
+        "--repeat",
+        help="number of timed runs per stage (default: 5)",
+        type=int,
+        default=5,
+        metavar="N"
+    )
+    parser.add_argument(
+        "--stages",
+        help="stages to run (default: all)",
+        nargs="+",
+        choices=STAGES.keys(),
+        default=list(STAGES.keys()),
+        metavar="STAGE"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="write results as JSON to this file",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--compare",
+        help="compare results with a previous JSON result file",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--threshold",
+        help="slowdown factor reported as regression (default: 1.2)",
+        type=float,
+        default=1.2,
+        metavar="FACTOR"
+    )
+    return parser
+
+
+def run_stage(name: str, config: str, repeat: int) -> List[float]:
+    """Return wall times in seconds of all runs of a stage."""
+    times = []
+    for run in range(repeat):
+        timed = STAGES[name](config, run)
+        start = time.perf_counter()
+        timed()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict:
+    """Run all selected stages for each app count and return results."""
+    results = []
+    for app_count in args.apps:
+        with tempfile.TemporaryDirectory(prefix="ssdk-bench-") as root:
+            config = generate_libraries(root, app_count, args.libraries)
+            for name in args.stages:
+                times = run_stage(name, config, args.repeat)
+                results.append({
+                    "stage": name,
+                    "apps": app_count,
+                    "best": min(times),
+                    "mean": statistics.mean(times),
+                    "runs": times,
+                })
+                print(
+                    f"{name:16}{app_count:>8} apps"
+                    f"{min(times) * 1000:>12.2f} ms best"
+                    f"{statistics.mean(times) * 1000:>12.2f} ms mean",
+                    file=sys.stderr
+                )
+    return {
+        "version": RESULT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "libraries": args.libraries,
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print best times relative to baseline and return success.
+
+    The comparison succeeds if no stage is slower than threshold allows.
+    """
+    previous = {
+        (result["stage"], result["apps"]): result["best"]
+        for result in baseline["results"]
+    }
+    passed = True
+    for result in report["results"]:
+        key = result["stage"], result["apps"]
+        if key not in previous or previous[key] <= 0:
+            continue
+        factor = result["best"] / previous[key]
+        regression = factor > threshold
+        passed = passed and not regression
+        print(
+            f"{key[0]:16}{key[1]:>8} apps{factor:>8.2f}x"
+            + ("  REGRESSION" if regression else "")
+        )
+    return passed
+
+
+def main() -> None:
+    """Run benchmarks and write or compare results."""
+    args = get_parser().parse_args()
+    report = run_benchmarks(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        if not os.path.isfile(args.compare):
+            sys.exit(f"cannot find result file '{args.compare}'")
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
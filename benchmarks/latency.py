@@ -0,0 +1,111 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Compare sequential and asyncio runs with simulated file latency.
+
+Every opened manifest is delayed by a fixed latency to simulate Steam
+Libraries on network shares. Manifests are reset to priority 0 before
+each run, so every manifest is read and written.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from typing import IO, Dict, List
+from unittest import mock
+
+from ssdk.aio import update_libraries
+from ssdk.config import Config
+from ssdk.manifest import ManifestHandler
+from ssdk.runner import update_manifest
+
+from .stages import get_manifests
+from .synthetic import generate_libraries, get_library_parser
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return parser for latency benchmark command line arguments."""
+    parser = get_library_parser(
+        "python -m benchmarks.latency",
+        "Time asyncio engine against sequential processing.",
+        200,
+        libraries=True
+    )
+    parser.add_argument(
+        "--latency",
+        help="simulated seconds per opened manifest (default: 0.01)",
+        type=float,
+        default=0.01,
+        metavar="SEC"
+    )
+    parser.add_argument(
+        "--limits",
+        help="concurrency limits per library (default: 1 2 4 8 16)",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16],
+        metavar="N"
+    )
+    return parser
+
+
+def reset(manifests: List[str]) -> None:
+    """Set priority of all manifests to 0 so every run writes them."""
+    for path in manifests:
+        ManifestHandler(path).write_new_update_priority(0)
+
+
+def run_benchmark(config: str, limits: List[int], latency: float) -> Dict:
+    """Return seconds of sequential and asyncio runs for each limit."""
+    libraries = Config(config).read()
+    manifests = get_manifests(config)
+    original = ManifestHandler._open  # pylint: disable=protected-access
+
+    def slow_open(handler: ManifestHandler, *args, **kwargs) -> IO:
+        time.sleep(latency)
+        return original(handler, *args, **kwargs)
+
+    results: Dict = {"manifests": len(manifests), "latency": latency}
+    with mock.patch.object(ManifestHandler, "_open", slow_open):
+        reset(manifests)
+        started = time.perf_counter()
+        for path in manifests:
+            update_manifest(path, 2)
+        results["sequential"] = time.perf_counter() - started
+        results["limits"] = {}
+        for limit in limits:
+            reset(manifests)
+            started = time.perf_counter()
+            list(update_libraries(libraries, 2, limit))
+            seconds = time.perf_counter() - started
+            results["limits"][str(limit)] = {
+                "seconds": seconds,
+                "speedup": results["sequential"] / seconds,
+            }
+    return results
+
+
+def main() -> None:
+    """Generate libraries, run latency benchmark and print JSON."""
+    args = get_parser().parse_args()
+    with tempfile.TemporaryDirectory(prefix="ssdk-latency-") as root:
+        config = generate_libraries(root, args.apps, args.libraries)
+        results = run_benchmark(config, args.limits, args.latency)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Compare full and early-terminating manifest reads.
+
+For each mode all manifests are read while the handlers are kept alive,
+as they are while results are collected. The report contains the bytes
+read, the peak of traced memory and the best wall time of all runs.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+from ssdk.manifest import ManifestHandler
+from ssdk.runner import MANIFEST_KEYS
+
+from .stages import get_manifests
+from .synthetic import generate_libraries, get_library_parser
+
+MODES: Dict[str, Optional[Sequence[str]]] = {
+    "full": None,
+    "streaming": MANIFEST_KEYS,
+}
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return parser for read benchmark command line arguments."""
+    parser = get_library_parser(
+        "python -m benchmarks.reads",
+        "Compare bytes, memory and time of manifest reads.",
+        1000
+    )
+    parser.add_argument(
+        "--repeat",
+        help="number of timed runs per mode (default: 5)",
+        type=int,
+        default=5,
+        metavar="N"
+    )
+    return parser
+
+
+def measure(manifests: List[str], keys: Optional[Sequence[str]]) -> Dict:
+    """Return bytes read and peak memory of reading all manifests."""
+    tracemalloc.start()
+    try:
+        handlers = [ManifestHandler(path, keys) for path in manifests]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "bytes_read": sum(handler.bytes_read for handler in handlers),
+        "peak_memory": peak,
+    }
+
+
+def best_time(
+    manifests: List[str], keys: Optional[Sequence[str]], repeat: int
+) -> float:
+    """Return best wall time of reading all manifests."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for path in manifests:
+            ManifestHandler(path, keys)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main() -> None:
+    """Generate a library, compare read modes and print JSON."""
+    args = get_parser().parse_args()
+    results: Dict = {"apps": args.apps, "modes": {}}
+    with tempfile.TemporaryDirectory(prefix="ssdk-reads-") as root:
+        manifests = get_manifests(generate_libraries(root, args.apps))
+        for mode, keys in MODES.items():
+            report = measure(manifests, keys)
+            report["best"] = best_time(manifests, keys, args.repeat)
+            results["modes"][mode] = report
+    full, streaming = results["modes"]["full"], results["modes"]["streaming"]
+    results["ratios"] = {
+        name: streaming[name] / full[name]
+        for name in ("bytes_read", "peak_memory", "best")
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Benchmark stages timing parts of the ssdk pipeline.
+
+Each stage is a function receiving the path to a config file and the
+number of the current run. It does all necessary setup and returns the
+callable that is timed.
+"""
+
+import contextlib
+import io
+import re
+import sys
+from typing import Callable, Dict, Iterator, List
+
+from ssdk.cli import ssdk
+from ssdk.config import Config
+from ssdk.core.models import SteamLibrary
+from ssdk.manifest import ManifestHandler
+from ssdk.rules import PriorityRules, Rule
+from ssdk.runner import MANIFEST_KEYS
+
+Timed = Callable[[], object]
+Stage = Callable[[str, int], Timed]
+
+
+def get_manifests(config: str) -> List[str]:
+    """Return paths of all manifests in libraries of config file."""
+    return [
+        path for lib in Config(config).read()
+        for path in lib.get_appmanifest_list()
+    ]
+
+
+@contextlib.contextmanager
+def patch_argv(argv: List[str]) -> Iterator[None]:
+    """Replace sys.argv with given list for the duration of context."""
+    original, sys.argv = sys.argv, argv
+    try:
+        yield
+    finally:
+        sys.argv = original
+
+
+def config_load(config: str, _run: int) -> Timed:
+    """Time reading the config file."""
+    return lambda: Config(config).read()
+
+
+def listing(config: str, _run: int) -> Timed:
+    """Time listing manifests in each library without cached results."""
+    paths = [lib.path for lib in Config(config).read()]
+    return lambda: [
+        SteamLibrary(path).get_appmanifest_list() for path in paths
+    ]
+
+
+def parsing(config: str, _run: int) -> Timed:
+    """Time reading and parsing every manifest."""
+    manifests = get_manifests(config)
+    return lambda: [ManifestHandler(path) for path in manifests]
+
+
+def parsing_regex(config: str, _run: int) -> Timed:
+    """Time the regex scan used before the KeyValues parser."""
+    manifests = get_manifests(config)
+
+    def scan() -> None:
+        for path in manifests:
+            with open(path, "r", encoding="utf-8") as manifest:
+                content = manifest.read()
+            re.search(r'\t"AutoUpdateBehavior"\t\t"(\d)"', content).group(1)
+            re.search(r'\t"name"\t\t"(.*)"', content).group(1)
+    return scan
+
+
+def scanning(config: str, _run: int) -> Timed:
+    """Time reading only the manifest keys needed for a default run."""
+    manifests = get_manifests(config)
+    return lambda: [
+        ManifestHandler(path, MANIFEST_KEYS) for path in manifests
+    ]
+
+
+def writing(config: str, _run: int) -> Timed:
+    """Time writing a changed priority to every parsed manifest."""
+    handlers = [ManifestHandler(path) for path in get_manifests(config)]
+
+    def write() -> None:
+        for handler in handlers:
+            handler.write_new_update_priority(
+                (handler.update_priority + 1) % 3
+            )
+    return write
+
+
+def rules(config: str, _run: int) -> Timed:
+    """Time evaluating 500 rules of all kinds for each manifest."""
+    handlers = [ManifestHandler(path) for path in get_manifests(config)]
+    compiled = PriorityRules([
+        rule for number in range(100) for rule in (
+            Rule(number % 3, "appid", str(number * 7)),
+            Rule(number % 3, "name", f"Title {number}"),
+            Rule(number % 3, "name", f"*Title {number}"),
+            Rule(number % 3, "regex", f"^Game{number}$"),
+            Rule(number % 3, "library", f"/nonexistent/{number}"),
+        )
+    ], 2)
+    return lambda: [
+        compiled.get_priority(handler.app_id, handler.game_title, handler.file)
+        for handler in handlers
+    ]
+
+
+def pipeline(config: str, run: int) -> Timed:
+    """Time entry point ssdk with a different priority in each run."""
+    argv = [sys.argv[0], "-c", config, "--update-priority", str(run % 3)]
+
+    def run_main() -> None:
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            stack.enter_context(contextlib.suppress(SystemExit))
+            stack.enter_context(patch_argv(argv))
+            ssdk.main()
+    return run_main
+
+
+STAGES: Dict[str, Stage] = {
+    "config": config_load,
+    "listing": listing,
+    "parsing": parsing,
+    "parsing_regex": parsing_regex,
+    "scanning": scanning,
+    "writing": writing,
+    "rules": rules,
+    "pipeline": pipeline,
+}
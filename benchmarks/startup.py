@@ -0,0 +1,139 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Measure start-up cost of the ssdk entry points.
+
+The import time of each entry point module is taken from the output of
+'python -X importtime' in a fresh interpreter. The wall time of complete
+runs on a generated library is compared with the time an interpreter
+needs to start without importing ssdk at all.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from .synthetic import generate_libraries, get_library_parser
+
+ENTRY_POINTS = ("ssdk.cli.ssdk", "ssdk.cli.lib")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Return parser for start-up benchmark command line arguments."""
+    parser = get_library_parser(
+        "python -m benchmarks.startup",
+        "Report import and wall time of ssdk entry points.",
+        100
+    )
+    parser.add_argument(
+        "--repeat",
+        help="number of timed runs per command (default: 10)",
+        type=int,
+        default=10,
+        metavar="N"
+    )
+    parser.add_argument(
+        "--top",
+        help="number of slowest imported modules listed (default: 10)",
+        type=int,
+        default=10,
+        metavar="N"
+    )
+    return parser
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Return name, self and cumulative microseconds of each import."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(own), int(cumulative)))
+    return times
+
+
+def measure_imports(module: str, top: int) -> Dict:
+    """Return import time of module and its slowest imports."""
+    times = import_times(module)
+    slowest = sorted(times, key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "cumulative_us": next(
+            cumulative for name, _, cumulative in times if name == module
+        ),
+        "modules": len(times),
+        "slowest": {name: own for name, own, _ in slowest},
+    }
+
+
+def best_time(command: List[str], repeat: int) -> float:
+    """Return best wall time of running command in a new process."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True
+        )
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main() -> None:
+    """Generate a library, time the entry points and print JSON."""
+    args = get_parser().parse_args()
+    results: Dict = {
+        "apps": args.apps,
+        "imports": {
+            module: measure_imports(module, args.top)
+            for module in ENTRY_POINTS
+        },
+        "runs": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="ssdk-startup-") as root:
+        config = generate_libraries(root, args.apps)
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "ssdk": [
+                sys.executable, "-m", "ssdk.cli.ssdk", "-c", config, "-q"
+            ],
+            "ssdk-lib list": [
+                sys.executable, "-m", "ssdk.cli.lib", "-c", config, "list"
+            ],
+        }
+        for name, command in commands.items():
+            results["runs"][name] = best_time(command, args.repeat)
+    interpreter = results["runs"]["interpreter"]
+    results["overhead"] = {
+        name: seconds - interpreter
+        for name, seconds in results["runs"].items()
+        if name != "interpreter"
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Generator for synthetic Steam Libraries with realistic manifests."""
+
+import argparse
+import os
+import random
+from typing import List, Union
+
+WORDS = (
+    "Age", "Battle", "City", "Dark", "Empire", "Fallen", "Galaxy", "Hero",
+    "Island", "Journey", "Kingdom", "Legend", "Mystery", "Night", "Origin",
+    "Planet", "Quest", "Rogue", "Shadow", "Tales", "Union", "Void", "War"
+)
+
+
+def generate_manifest(app_id: int, rng: random.Random) -> str:
+    """Return content of an appmanifest with randomized keys and size.
+
+    Most manifests have a few depots, some have large InstalledDepots
+    and UserConfig sections like big games with many DLCs.
+    """
+    name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+    depot_count = rng.choice((1, 1, 1, 2, 2, 3, 4, 6, 12, 60))
+    size = rng.randint(10 ** 6, 10 ** 11)
+    lines = [
+        '"AppState"',
+        "{",
+        f'\t"appid"\t\t"{app_id}"',
+        '\t"Universe"\t\t"1"',
+        f'\t"name"\t\t"{name} {app_id}"',
+        f'\t"StateFlags"\t\t"{rng.choice((4, 4, 4, 6, 1026))}"',
+        f'\t"installdir"\t\t"{name.replace(" ", "")}{app_id}"',
+        f'\t"LastUpdated"\t\t"{rng.randint(1500000000, 1700000000)}"',
+        f'\t"UpdateResult"\t\t"{rng.choice((0, 0, 0, 2))}"',
+        f'\t"SizeOnDisk"\t\t"{size}"',
+        f'\t"buildid"\t\t"{rng.randint(10 ** 5, 10 ** 7)}"',
+        '\t"LastOwner"\t\t"76561198000000000"',
+        f'\t"BytesToDownload"\t\t"{rng.choice((0, 0, 0, size // 10))}"',
+        '\t"BytesDownloaded"\t\t"0"',
+        '\t"BytesToStage"\t\t"0"',
+        '\t"BytesStaged"\t\t"0"',
+        f'\t"AutoUpdateBehavior"\t\t"{rng.randint(0, 2)}"',
+        '\t"AllowOtherDownloadsWhileRunning"\t\t"0"',
+        '\t"ScheduledAutoUpdate"\t\t"0"',
+        '\t"InstalledDepots"',
+        "\t{",
+    ]
+    for depot in range(depot_count):
+        lines.extend((
+            f'\t\t"{app_id + depot + 1}"',
+            "\t\t{",
+            f'\t\t\t"manifest"\t\t"{rng.getrandbits(62)}"',
+            f'\t\t\t"size"\t\t"{rng.randint(10 ** 4, 10 ** 10)}"',
+            f'\t\t\t"dlcappid"\t\t"{app_id + depot + 1}"',
+            "\t\t}",
+        ))
+    lines.extend(("\t}", '\t"UserConfig"', "\t{"))
+    lines.append('\t\t"language"\t\t"english"')
+    for _ in range(depot_count // 4):
+        lines.append(f'\t\t"BetaKey{rng.getrandbits(16)}"\t\t"public"')
+    lines.extend(("\t}", "}", ""))
+    return "\n".join(lines)
+
+
+def generate_library(
+    path: str, app_count: int, seed: int = 0, first_app_id: int = 10
+) -> None:
+    """Create Steam Library Folder with given number of manifests."""
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    for app_id in range(first_app_id, first_app_id + app_count * 10, 10):
+        manifest = os.path.join(path, f"appmanifest_{app_id}.acf")
+        with open(manifest, "w", encoding="utf-8", newline="\n") as file:
+            file.write(generate_manifest(app_id, rng))
+    library_file = os.path.join(path, "libraryfolder.vdf")
+    with open(library_file, "w", encoding="utf-8") as file:
+        file.write('"libraryfolder"\n{\n\t"contentid"\t\t"0"\n}\n')
+    os.makedirs(os.path.join(path, "common"), exist_ok=True)
+
+
+def generate_libraries(
+    root: str, app_count: int, library_count: int = 1, seed: int = 0
+) -> str:
+    """Create libraries sharing app_count manifests and return config.
+
+    The config file is written to root and lists all created libraries.
+    """
+    libraries: List[str] = []
+    per_library, remainder = divmod(app_count, library_count)
+    first_app_id = 10
+    for index in range(library_count):
+        count = per_library + (1 if index < remainder else 0)
+        path = os.path.join(root, f"library{index}", "steamapps")
+        generate_library(path, count, seed + index, first_app_id)
+        first_app_id += count * 10
+        libraries.append(path)
+    config = os.path.join(root, "ssdk.cfg")
+    with open(config, "w", encoding="utf-8") as file:
+        file.write("\n".join(libraries))
+    return config
+
+
+def get_library_parser(
+    prog: str,
+    description: str,
+    apps: Union[int, List[int]],
+    libraries: bool = False
+) -> argparse.ArgumentParser:
+    """Return parser with options for the generated Steam Libraries.
+
+    If apps is a list, several app counts can be given. The number of
+    libraries is only an option if libraries is True.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    if isinstance(apps, list):
+        parser.add_argument(
+            "--apps",
+            help="number(s) of generated apps"
+            f" (default: {' '.join(map(str, apps))})",
+            type=int,
+            nargs="+",
+            default=apps,
+            metavar="N"
+        )
+    else:
+        parser.add_argument(
+            "--apps",
+            help=f"number of generated apps (default: {apps})",
+            type=int,
+            default=apps,
+            metavar="N"
+        )
+    if libraries:
+        parser.add_argument(
+            "--libraries",
+            help="number of libraries the apps are spread over (default: 2)",
+            type=int,
+            default=2,
+            metavar="N"
+        )
+    return parser
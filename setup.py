@@ -64,10 +64,11 @@ if __name__ == '__main__':
         long_description=README,
         long_description_content_type="text/markdown",
         version=VERSION,
-        packages=find_packages(),
+        packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
         include_package_data=True,
         platforms="windows",
         python_requires=">=3.9",
+        extras_require={"watch": ["watchdog"]},
         license="EUPL",
         url=GITHUB,
         author="Valentin Weber",
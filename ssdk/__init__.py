@@ -11,4 +11,48 @@
 #   official translations of the licence in another language of the EU.
 ##
 
-"""Main package for steam-scheduled-download-killer."""
+"""Main package for steam-scheduled-download-killer.
+
+Use apply or iter_libraries to update Steam Libraries from Python:
+
+    import ssdk
+    libraries = ssdk.Config(config_file).read()
+    for result in ssdk.apply(libraries, priority=2):
+        ...
+
+The public names are imported on first access, so the entry points
+only load the modules the chosen command needs.
+"""
+
+import importlib
+from typing import Any, List
+
+_EXPORTS = {
+    "Config": "config",
+    "LibraryRun": "api",
+    "ManifestResult": "runner",
+    "PriorityRules": "rules",
+    "StateIndex": "state",
+    "SteamLibrary": "core.models",
+    "UrgencyQueue": "urgency",
+    "apply": "api",
+    "iter_libraries": "api",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import module of public name on first access."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(
+        importlib.import_module(f".{_EXPORTS[name]}", __name__), name
+    )
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """Return names of module and public names not imported yet."""
+    return sorted(set(globals()) | set(__all__))
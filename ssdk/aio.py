@@ -0,0 +1,151 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Asyncio based processing of Steam Libraries.
+
+Each library runs through three stages: listing its manifests, reading
+and parsing each manifest and writing the new priority if necessary.
+Blocking file access runs in an executor, with at most limit file
+operations per library in flight so a single network share isn't
+flooded while all libraries are processed at the same time.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple
+)
+
+from .core.models import SteamLibrary
+from .runner import (
+    ManifestResult,
+    PendingWrite,
+    Priority,
+    check_manifest,
+    write_manifest
+)
+from .state import StateIndex
+
+LibraryResults = Tuple[SteamLibrary, Optional[List[ManifestResult]]]
+
+
+async def update_manifests_async(
+    paths: List[str],
+    priority: Priority,
+    limit: int = 4,
+    index: Optional[StateIndex] = None,
+    executor: Optional[Executor] = None
+) -> List[ManifestResult]:
+    """Update given manifests with limit workers and return results.
+
+    Results are returned in the order of the given paths.
+    """
+    loop = asyncio.get_running_loop()
+    results: List[Optional[ManifestResult]] = [None] * len(paths)
+    queue = iter(enumerate(paths))
+
+    async def worker() -> None:
+        for position, path in queue:
+            checked = await loop.run_in_executor(
+                executor, check_manifest, path, priority, index
+            )
+            if isinstance(checked, PendingWrite):
+                checked = await loop.run_in_executor(
+                    executor, write_manifest, checked
+                )
+            results[position] = checked
+
+    await asyncio.gather(*(worker() for _ in range(min(limit, len(paths)))))
+    return results
+
+
+async def update_library_async(
+    lib: SteamLibrary,
+    priority: Priority,
+    limit: int = 4,
+    index: Optional[StateIndex] = None,
+    executor: Optional[Executor] = None
+) -> Optional[List[ManifestResult]]:
+    """Update all manifests of library or return None if unlistable."""
+    loop = asyncio.get_running_loop()
+    try:
+        paths = await loop.run_in_executor(executor, lib.get_appmanifest_list)
+    except OSError:
+        return None
+    return await update_manifests_async(
+        paths, priority, limit, index, executor
+    )
+
+
+async def apply_async(
+    libraries: List[SteamLibrary],
+    priority: Priority,
+    limit: int = 4,
+    index: Optional[StateIndex] = None,
+    executor: Optional[Executor] = None
+) -> AsyncIterator[LibraryResults]:
+    """Update all libraries concurrently and yield their results.
+
+    Libraries are yielded in the given order as soon as all libraries
+    before them are done. Results are None if a library is unlistable.
+    """
+    tasks = [
+        asyncio.ensure_future(
+            update_library_async(lib, priority, limit, index, executor)
+        )
+        for lib in libraries
+    ]
+    try:
+        for lib, task in zip(libraries, tasks):
+            yield lib, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def update_libraries(
+    libraries: List[SteamLibrary],
+    priority: Priority,
+    limit: int = 4,
+    index: Optional[StateIndex] = None
+) -> Iterator[LibraryResults]:
+    """Run apply_async in a new event loop and yield its results.
+
+    The results of a library are yielded as soon as it is done, the
+    loop only runs while the next library is awaited. The executor has
+    enough threads for limit operations per library.
+    """
+    with ThreadPoolExecutor(limit * max(len(libraries), 1)) as executor:
+        loop = asyncio.new_event_loop()
+        results = apply_async(libraries, priority, limit, index, executor)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.run_until_complete(_settle(asyncio.all_tasks(loop)))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+
+async def _settle(tasks: Iterable["asyncio.Task"]) -> None:
+    """Wait until all given tasks are done or cancelled."""
+    await asyncio.gather(*tasks, return_exceptions=True)
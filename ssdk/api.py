@@ -0,0 +1,181 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Python interface for updating Steam Libraries without the CLI.
+
+Results are yielded as named tuples while the manifests are processed.
+Nothing is printed and errors of single manifests or libraries are part
+of the results, so a caller can drive many runs from one process.
+"""
+
+import time
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional
+)
+
+from .core.models import SteamLibrary
+from .runner import ManifestResult, Priority, update_manifests
+from .state import StateIndex
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from .devices import DeviceScheduler
+    from .urgency import UrgencyQueue
+
+
+class LibraryRun(NamedTuple):
+    """Manifests of a library and an iterator over their results.
+
+    If the library can't be listed, error contains the reason and there
+    are neither manifests nor results.
+    """
+
+    library: SteamLibrary
+    manifests: List[str]
+    results: Iterator[ManifestResult]
+    listing_time: float = 0.0
+    error: Optional[str] = None
+
+
+def iter_libraries(
+    libraries: Iterable[SteamLibrary],
+    priority: Priority = 2,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None,
+    scheduler: Optional["DeviceScheduler"] = None,
+    async_limit: Optional[int] = None,
+    urgency: Optional["UrgencyQueue"] = None
+) -> Iterator[LibraryRun]:
+    """Update all libraries and yield a run for each one in given order.
+
+    All libraries are listed and queued before the first run is yielded,
+    so with a pool, scheduler or async limit they are processed at the
+    same time. With an urgency queue, games with pending updates are
+    written as soon as they are read and all others once all manifests
+    were read. States of processed manifests are recorded in the index
+    and entries of vanished manifests are removed from it once all runs
+    were consumed. Saving the index is up to the caller.
+    """
+    libraries = list(libraries)
+    runs: Iterable[LibraryRun]
+    if urgency is not None:
+        runs = [
+            _library_run(lib, results, index)
+            for lib, results in urgency.update_libraries(
+                libraries, priority, pool, index
+            )
+        ]
+    elif async_limit:
+        from .aio import update_libraries  # asyncio is slow to import
+        runs = (
+            _library_run(lib, results, index)
+            for lib, results in update_libraries(
+                libraries, priority, async_limit, index
+            )
+        )
+    else:
+        runs = [
+            _queue_library(lib, priority, pool, index, scheduler)
+            for lib in libraries
+        ]
+    manifests: List[str] = []
+    for run in runs:
+        manifests.extend(run.manifests)
+        yield run
+    if index is not None:
+        index.retain(manifests)
+
+
+def apply(
+    libraries: Iterable[SteamLibrary],
+    priority: Priority = 2,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None,
+    scheduler: Optional["DeviceScheduler"] = None,
+    async_limit: Optional[int] = None,
+    urgency: Optional["UrgencyQueue"] = None
+) -> Iterator[ManifestResult]:
+    """Update all libraries and yield the result of each manifest.
+
+    A library that can't be listed is reported by a single result with
+    the path of the library and an error.
+    """
+    for run in iter_libraries(
+        libraries, priority, pool, index, scheduler, async_limit, urgency
+    ):
+        if run.error is not None:
+            yield ManifestResult(
+                run.library.path, error=run.error, error_type="OSError"
+            )
+        yield from run.results
+
+
+def _queue_library(
+    lib: SteamLibrary,
+    priority: Priority,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None,
+    scheduler: Optional["DeviceScheduler"] = None
+) -> LibraryRun:
+    """List library and queue its manifests for processing."""
+    started = time.perf_counter()
+    try:
+        manifests = lib.get_appmanifest_list()
+        device_queue = None
+        if scheduler is not None:
+            device_queue = scheduler.get_queue(lib)
+    except OSError:
+        return LibraryRun(
+            lib,
+            [],
+            iter(()),
+            time.perf_counter() - started,
+            f"unable to fetch manifests in '{lib.path}'"
+        )
+    listing_time = time.perf_counter() - started
+    if device_queue is not None:
+        results = device_queue.submit(manifests, priority, index)
+    else:
+        results = update_manifests(manifests, priority, pool, index)
+    return LibraryRun(
+        lib, manifests, _record(results, index), listing_time
+    )
+
+
+def _library_run(
+    lib: SteamLibrary,
+    results: Optional[List[ManifestResult]],
+    index: Optional[StateIndex] = None
+) -> LibraryRun:
+    """Return run for results of the asyncio engine or urgency queue."""
+    if results is None:
+        error = f"unable to fetch manifests in '{lib.path}'"
+        return LibraryRun(lib, [], iter(()), error=error)
+    manifests = [result.path for result in results]
+    return LibraryRun(lib, manifests, _record(iter(results), index))
+
+
+def _record(
+    results: Iterator[ManifestResult], index: Optional[StateIndex] = None
+) -> Iterator[ManifestResult]:
+    """Yield results and record their states in index."""
+    for result in results:
+        if index is not None and result.state is not None:
+            index.entries[result.path] = result.state
+        yield result
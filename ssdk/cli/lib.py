@@ -15,11 +15,17 @@
 
 import argparse
 import sys
+from typing import TYPE_CHECKING, List, Optional
 
 from . import SSDK_MAIN, SSDK_LIB
-from ..config import Config, ConfigFileError
+from ..config import Config, ConfigFileError, read_lib_dirs
+from ..stats import RunStats, write_stats
 from ..core.utils import BaseArgumentParser
 
+if TYPE_CHECKING:
+    from ..games import Game
+    from ..profiling import Profiler
+
 
 class SsdkLibParser(BaseArgumentParser):
     """Command Line Parser for ssdk-lib entry point."""
@@ -28,8 +34,13 @@ class SsdkLibParser(BaseArgumentParser):
         "make": "create a config file with all given Steam Library Folder(s)",
         "list": "show a list of all Steam Library Folder(s)",
         "rm": "remove the given Steam Library Folder(s) from config file",
-        "add": "add given Steam Library Folder(s) to config file"
+        "add": "add given Steam Library Folder(s) to config file",
+        "games": "show all games of the index updated by 'ssdk --games'",
+        "find": "show games of the index whose name contains NAME",
+        "stats": "show number, size and priorities of games in index"
     }
+    QUERY_COMMANDS = ("list", "games", "stats")
+    EDIT_COMMANDS = ("make", "rm", "add")
 
     def __init__(self):
         """Initialize the parser and add arguments."""
@@ -40,7 +51,7 @@ class SsdkLibParser(BaseArgumentParser):
         super().__init__(
             prog=SSDK_LIB,
             desc=desc,
-            epilog=self.get_epilog(),
+            epilog=self.get_epilog,
         )
         self.add_argument(
             "--ignore-existing",
@@ -48,6 +59,11 @@ class SsdkLibParser(BaseArgumentParser):
             action="store_true",
             dest="ignore"
         )
+        self.add_argument(
+            "--from-file",
+            help="read additional library paths from FILE ('-' for stdin)",
+            metavar="FILE"
+        )
         self.add_argument(
             "command",
             metavar="COMMAND",
@@ -57,7 +73,7 @@ class SsdkLibParser(BaseArgumentParser):
         self.add_argument(
             "libraries",
             metavar="LIBRARY",
-            help="path(s) to Steam Library Folders (not needed for 'list')",
+            help="path(s) to Steam Library Folders or NAME for 'find'",
             nargs="*"
         )
 
@@ -71,7 +87,18 @@ class SsdkLibParser(BaseArgumentParser):
     def get_validated_args(self) -> argparse.Namespace:
         """Parse and validate the command line arguments."""
         args = self.parse_args()
-        if args.command != "list" and not args.libraries:
+        if args.command == "find" and not args.libraries:
+            self.error(
+                "the following arguments are required for command"
+                " 'find': NAME"
+            )
+        if args.from_file and args.command not in self.EDIT_COMMANDS:
+            self.error(
+                f"argument --from-file: not allowed with '{args.command}'"
+            )
+        if args.command not in self.QUERY_COMMANDS and not (
+            args.libraries or args.from_file
+        ):
             self.error(
                 "the following arguments are required for command"
                 f" '{args.command}': LIBRARY"
@@ -83,18 +110,43 @@ def main() -> None:
     """ssdk-lib entry point."""
     cli = SsdkLibParser()
     args = cli.get_validated_args()
+    if args.profile:
+        from ..profiling import run_profiled
+        run_profiled(args.profile, cli.prog, run_command, cli, args)
+    else:
+        run_command(cli, args)
+
+
+def run_command(
+    cli: SsdkLibParser,
+    args: argparse.Namespace,
+    profiler: Optional["Profiler"] = None
+) -> None:
+    """Run command given by validated args, profiled if given."""
     cfg = Config(args.config)
+    stats = RunStats(cli.prog)
+    succeeded = True
     try:
+        if args.from_file:
+            args.libraries += read_lib_dirs(args.from_file)
         if (cmd := args.command) == "add":
-            cfg.add(args.libraries)
+            with stats.phase("config"):
+                cfg.add(args.libraries)
         elif cmd == "rm":
-            cfg.remove(args.libraries)
+            with stats.phase("config"):
+                cfg.remove(args.libraries)
         elif cmd == "make":
-            cfg.write(args.libraries, args.ignore)
+            with stats.phase("config"):
+                cfg.write(args.libraries, args.ignore)
         elif cmd == "list":
-            print("\n".join(str(lib) for lib in cfg.read()))
+            list_libraries(cfg, stats, profiler)
+        elif cmd in ("games", "find"):
+            name = " ".join(args.libraries) if cmd == "find" else None
+            succeeded = query_games(args.config, stats, name)
+        elif cmd == "stats":
+            succeeded = query_library_stats(args.config, stats)
     except ConfigFileError as exc:
-        print("ERROR: " + exc.args[0])
+        print("ERROR:", ": ".join(exc.args))
         sys.exit(1)
     except KeyboardInterrupt:
         print("Exiting Application.")
@@ -102,6 +154,89 @@ def main() -> None:
     except:  # noqa pylint: disable=bare-except
         print("ERROR: caught an unexpected exception")
         sys.exit(2)
+    if args.stats:
+        write_stats(stats, args.stats)
+    if not succeeded:
+        sys.exit(1)
+
+
+def list_libraries(
+    cfg: Config, stats: RunStats, profiler: Optional["Profiler"] = None
+) -> None:
+    """Print each library in config with the number of its games."""
+    with stats.phase("config"):
+        libraries = cfg.read()
+    if profiler is not None:
+        profiler.snapshot("config")
+    for lib in libraries:
+        with stats.phase("listing", lib.path):
+            stats.add_count("listed", lib.game_count, lib.path)
+        with stats.phase("output", lib.path):
+            print(lib)
+
+
+def query_games(
+    config_file: str, stats: RunStats, name: Optional[str] = None
+) -> bool:
+    """Print games of game index containing name and return success."""
+    from ..games import GameIndex, GameIndexError
+    try:
+        with stats.phase("query"):
+            games = GameIndex.for_config(config_file).games(name)
+    except GameIndexError as exc:
+        print("ERROR:", ": ".join(exc.args))
+        return False
+    with stats.phase("output"):
+        list_games(games)
+    return True
+
+
+def query_library_stats(config_file: str, stats: RunStats) -> bool:
+    """Print number, size and priorities of games and return success."""
+    from ..games import GameIndex, GameIndexError
+    try:
+        with stats.phase("query"):
+            library_stats = GameIndex.for_config(config_file).stats()
+    except GameIndexError as exc:
+        print("ERROR:", ": ".join(exc.args))
+        return False
+    with stats.phase("output"):
+        for lib in library_stats:
+            priorities = ", ".join(
+                f"{count} with priority {priority}"
+                for priority, count in sorted(lib.priorities.items())
+            )
+            print(
+                f"{lib.library}: {lib.games} games,"
+                f" {format_size(lib.size_on_disk)} ({priorities})"
+            )
+    return True
+
+
+def list_games(games: List["Game"]) -> None:
+    """Print games grouped by library with app ID, priority and size."""
+    library = None
+    for game in games:
+        if game.library != library:
+            library = game.library
+            print(f"=== Steam Library: {library}")
+        print(
+            f"    {game.appid:>10}  {game.priority}"
+            f"  {format_size(game.size_on_disk):>10}  {game.name}"
+        )
+    print(f"Found {len(games)} games in index.")
+
+
+def format_size(size: int) -> str:
+    """Return size in bytes with binary unit for display."""
+    if size < 1024:
+        return f"{size} B"
+    scaled = size / 1024
+    for unit in ("KiB", "MiB", "GiB"):
+        if scaled < 1024:
+            return f"{scaled:.1f} {unit}"
+        scaled /= 1024
+    return f"{scaled:.1f} TiB"
 
 
 if __name__ == '__main__':
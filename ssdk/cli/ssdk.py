@@ -13,17 +13,59 @@
 
 """Parser and entry point for ssdk."""
 
+import argparse
 import sys
+from typing import (
+    TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Tuple
+)
 
 from . import SSDK_MAIN, SSDK_BG, SSDK_LIB
+from ..api import LibraryRun, iter_libraries
 from ..config import Config, ConfigFileError
-from ..manifest import ManifestFileError, ManifestHandler, ManifestKeyError
-from ..core.utils import BaseArgumentParser, get_filepath_without_extension
+from ..discovery import DEFAULT_STEAM_DIR, DiscoveryError, LibraryDiscovery
+from ..fleet import Fleet, FleetError
+from ..journal import Journal, JournalError, rollback
+from ..retry import MAX_RETRIES, RetryQueue
+from ..output import FORMATS, ResultWriter, get_writer
+from ..rules import PriorityRules, RulesFileError
+from ..runner import (
+    Edit,
+    ManifestResult,
+    Priority,
+    edit_manifests,
+    update_manifests,
+    verify_state
+)
+from ..state import StateIndex, StateIndexError
+from ..stats import RunStats, write_stats
+from ..watch import LibraryWatcher, get_watcher
+from ..core.models import SteamLibrary
+from ..core.utils import (
+    BaseArgumentParser,
+    get_filepath_without_extension,
+    positive_float,
+    positive_int
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from ..devices import DeviceScheduler
+    from ..plan import Plan
+    from ..profiling import Profiler
 
 
 class SsdkParser(BaseArgumentParser):
     """Command Line Parser for ssdk entry point."""
 
+    ALLOWED_COMMANDS = {
+        "run": "update all manifests that need a new priority (default)",
+        "plan": "write changes that 'run' would make to the plan file",
+        "apply": "write changes of the plan file to unchanged manifests",
+        "set": "set given AppState keys of all manifests to given values",
+        "rollback": "restore values changed by given or last run in journal"
+    }
+
     ALLOWED_PRIORITIES = {
         "0": "always keep this game updated",
         "1": "only update this game when I launch it",
@@ -38,8 +80,50 @@ class SsdkParser(BaseArgumentParser):
         )
         entrypoint = get_filepath_without_extension(sys.argv[0])
         prog = SSDK_BG if entrypoint == SSDK_BG else SSDK_MAIN
-        super().__init__(prog, desc, self.get_epilog())
+        super().__init__(prog, desc, self.get_epilog)
 
+        self.add_argument(
+            "command",
+            metavar="COMMAND",
+            help="action to be executed (default: run)",
+            choices=self.ALLOWED_COMMANDS.keys(),
+            nargs="?",
+            default="run"
+        )
+        self.add_argument(
+            "values",
+            metavar="KEY=VALUE",
+            help="AppState keys and values for 'set' or RUN_ID for 'rollback'",
+            nargs="*"
+        )
+        self.add_argument(
+            "--plan",
+            help="plan file used by 'plan' and 'apply' commands",
+            metavar="FILE"
+        )
+        self.add_argument(
+            "--dry-run",
+            help="show changes without writing manifests or plan file",
+            action="store_true"
+        )
+        self.add_argument(
+            "--no-journal",
+            help="don't record written values for the 'rollback' command",
+            action="store_true"
+        )
+        self.add_argument(
+            "-q", "--quiet",
+            help="only print the summary of a run",
+            action="store_true"
+        )
+        self.add_argument(
+            "--format",
+            help="output format of a run: text or jsonl (default: text)",
+            choices=FORMATS,
+            default="text",
+            metavar="FORMAT",
+            dest="output_format"
+        )
         self.add_argument(
             "--update-priority",
             help="value the update priority should be set to (default: 2)",
@@ -48,24 +132,605 @@ class SsdkParser(BaseArgumentParser):
             default=2,
             metavar="PRIO"
         )
+        self.add_argument(
+            "--rules",
+            help="file with priorities for single games (see rule format)",
+            metavar="FILE"
+        )
+        self.add_argument(
+            "--configs",
+            help="glob or file listing config files processed together",
+            metavar="PATTERN"
+        )
+        self.add_argument(
+            "--discover",
+            help="use libraries listed by Steam instead of config file",
+            action="store_true"
+        )
+        self.add_argument(
+            "--steam-dir",
+            help="Steam installation used by '--discover'",
+            default=DEFAULT_STEAM_DIR,
+            metavar="DIR"
+        )
+        self.add_argument(
+            "-j", "--jobs",
+            help="number of manifests processed concurrently (default: 1)",
+            type=positive_int,
+            default=1,
+            metavar="N"
+        )
+        self.add_argument(
+            "--per-device",
+            help="use a queue with N workers for each device (overrides -j)",
+            type=positive_int,
+            metavar="N"
+        )
+        self.add_argument(
+            "--async-limit",
+            help="use asyncio with N file operations per library at once",
+            type=positive_int,
+            metavar="N"
+        )
+        self.add_argument(
+            "--urgent-first",
+            help="write manifests of games with pending updates first",
+            action="store_true"
+        )
+        self.add_argument(
+            "--retries",
+            help="retries of manifests in use by Steam (default: 4)",
+            type=int,
+            choices=range(10),
+            default=MAX_RETRIES,
+            metavar="N"
+        )
+        self.add_argument(
+            "-i", "--incremental",
+            help="skip manifests unchanged since the last incremental run",
+            action="store_true"
+        )
+        self.add_argument(
+            "--full-rescan",
+            help="read all manifests and rebuild the index of '--incremental'",
+            action="store_true"
+        )
+        self.add_argument(
+            "--verify-index",
+            help="remove invalid entries from the index and exit",
+            action="store_true"
+        )
+        self.add_argument(
+            "--games",
+            help="update the game index queried by 'ssdk-lib games'",
+            action="store_true"
+        )
+        self.add_argument(
+            "--slowest",
+            help="number of slowest manifests listed in '--stats' report",
+            type=int,
+            default=0,
+            metavar="N"
+        )
+        self.add_argument(
+            "-w", "--watch",
+            help="keep running and update manifests whenever they change",
+            action="store_true"
+        )
+        self.add_argument(
+            "--watch-delay",
+            help="seconds without changes before updating (default: 2)",
+            type=positive_float,
+            default=2.0,
+            metavar="SEC"
+        )
 
     def get_epilog(self) -> str:
-        """Create formatted help message for each priority value."""
-        help_messages = (
+        """Create formatted help message for commands and priorities."""
+        command_messages = (
+            f"  {cmd:28}{msg}" for cmd, msg in self.ALLOWED_COMMANDS.items()
+        )
+        priority_messages = (
             f"  {cmd:28}{msg}" for cmd, msg in self.ALLOWED_PRIORITIES.items()
         )
-        return "priority values:\n" + "\n".join(help_messages)
+        return (
+            "allowed commands:\n" + "\n".join(command_messages)
+            + "\n\npriority values:\n" + "\n".join(priority_messages)
+            + "\n\nrule format:\n"
+            + "  PRIO appid:ID | name:GLOB | regex:REGEX | library:PATH\n"
+            + "  the first matching rule wins, others use '--update-priority'"
+        )
+
+    def get_validated_args(self) -> argparse.Namespace:
+        """Parse and validate the command line arguments."""
+        args = self.parse_args()
+        if args.slowest and not args.stats:
+            self.error("argument --slowest: requires argument --stats")
+        if args.command != "run" and args.watch:
+            self.error(
+                f"argument -w/--watch: not allowed with '{args.command}'"
+            )
+        if args.dry_run and args.watch:
+            self.error("argument -w/--watch: not allowed with '--dry-run'")
+        if args.configs and args.discover:
+            self.error(
+                "argument --configs: not allowed with argument --discover"
+            )
+        if args.configs and args.config == self.get_default("config") and (
+            not args.no_journal or args.incremental or args.full_rescan
+            or args.verify_index or args.games
+            or args.command == "plan" and not args.plan
+        ):
+            self.error(
+                "argument --configs: requires argument -c/--config to locate"
+                " journal, index and plan files"
+            )
+        if args.per_device and args.async_limit:
+            self.error(
+                "argument --per-device: not allowed with argument"
+                " --async-limit"
+            )
+        if args.urgent_first and (args.per_device or args.async_limit):
+            option = "--per-device" if args.per_device else "--async-limit"
+            self.error(
+                f"argument --urgent-first: not allowed with argument {option}"
+            )
+        if args.quiet or args.output_format != "text":
+            option = "-q/--quiet" if args.quiet else "--format"
+            if args.command != "run":
+                self.error(
+                    f"argument {option}: not allowed with '{args.command}'"
+                )
+            for given, other in (
+                (args.dry_run, "--dry-run"),
+                (args.watch, "-w/--watch"),
+                (args.verify_index, "--verify-index")
+            ):
+                if given:
+                    self.error(
+                        f"argument {option}: not allowed with argument {other}"
+                    )
+        if args.command == "set" and not args.values:
+            self.error(
+                "the following arguments are required for command"
+                " 'set': KEY=VALUE"
+            )
+        args.run_id = None
+        if args.command == "rollback" and args.values:
+            args.run_id, *args.values = args.values
+        if args.command != "set" and args.values:
+            self.error(f"unrecognized arguments: {' '.join(args.values)}")
+        values = {}
+        for item in args.values:
+            key, sep, text = item.partition("=")
+            if not key or not sep:
+                self.error(f"argument KEY=VALUE: invalid value: '{item}'")
+            if key == "AutoUpdateBehavior" and (
+                text not in self.ALLOWED_PRIORITIES
+            ):
+                self.error(f"argument KEY=VALUE: invalid priority: '{text}'")
+            values[key] = text
+        args.values = values
+        return args
+
+
+class RunTotals:
+    """Number of updated games of each library of a run.
+
+    If games is True, the last result of each manifest of a listed
+    library is kept in games for the game index.
+    """
+
+    def __init__(self, games: bool = False) -> None:
+        """Initialize totals without any library."""
+        self.updates: Dict[str, int] = {}
+        self.games: Dict[str, Dict[str, ManifestResult]] = {}
+        self.keep = games
+
+    @property
+    def updated(self) -> int:
+        """Return number of updated games of all libraries."""
+        return sum(self.updates.values())
+
+    def library(self, lib: SteamLibrary) -> None:
+        """Add library that was listed successfully."""
+        self.updates.setdefault(lib.path, 0)
+        if self.keep:
+            self.games.setdefault(lib.path, {})
+
+    def add(self, lib: SteamLibrary, result: ManifestResult) -> None:
+        """Add result of a manifest of library."""
+        self.updates[lib.path] = (
+            self.updates.get(lib.path, 0) + result.updated
+        )
+        if self.keep:
+            self.games[lib.path][result.path] = result
+
+
+class RunSetup(NamedTuple):
+    """Libraries, priority and index read before processing."""
+
+    libraries: List[SteamLibrary]
+    fleet: Optional[Fleet]
+    priority: Priority
+    index: Optional[StateIndex]
 
 
 def main() -> None:
     """Run entry point ssdk."""
     cli = SsdkParser()
-    args = cli.parse_args()
+    args = cli.get_validated_args()
+    if args.profile:
+        from ..profiling import run_profiled
+        run_profiled(args.profile, cli.prog, run_command, cli, args)
+    else:
+        run_command(cli, args)
+
+
+def run_command(
+    cli: SsdkParser,
+    args: argparse.Namespace,
+    profiler: Optional["Profiler"] = None
+) -> None:
+    """Run command given by validated args, profiled if given."""
+    stats = RunStats(cli.prog, args.slowest)
+    journal = None if args.no_journal else Journal.for_config(args.config)
+    if args.command == "apply":
+        apply_changes(get_plan(args), args.jobs, args.dry_run, journal)
+    elif args.command == "rollback":
+        with stats.phase("rollback"):
+            rollback_changes(
+                Journal.for_config(args.config),
+                args.run_id,
+                args.dry_run,
+                journal is not None
+            )
+    else:
+        setup = read_setup(cli, args, stats)
+        if profiler is not None:
+            profiler.snapshot("config")
+        if args.verify_index:
+            verify_index(setup.index)
+            return
+        process_libraries(args, setup, stats, journal, profiler)
+        return
+    if args.stats:
+        write_stats(stats, args.stats)
+
+
+def read_setup(
+    cli: SsdkParser, args: argparse.Namespace, stats: RunStats
+) -> RunSetup:
+    """Return libraries, priority and index given by args."""
+    libraries, fleet = read_libraries(args, stats)
+    priority: Priority = args.update_priority
+    if args.rules:
+        try:
+            with stats.phase("config"):
+                priority = PriorityRules.from_file(
+                    args.rules, args.update_priority, cli.ALLOWED_PRIORITIES
+                )
+        except RulesFileError as exc:
+            print("ERROR:", ": ".join(exc.args))
+            sys.exit(1)
+    index = None
+    if args.incremental or args.full_rescan or args.verify_index:
+        index = StateIndex.for_config(args.config)
+        if not index.load() and args.verify_index:
+            print(f"No valid index found at '{index.file}'")
+            sys.exit(1)
+        if args.full_rescan:
+            index.entries.clear()
+    return RunSetup(libraries, fleet, priority, index)
+
+
+def read_libraries(
+    args: argparse.Namespace, stats: RunStats
+) -> Tuple[List[SteamLibrary], Optional[Fleet]]:
+    """Return libraries given by args and fleet if several configs."""
+    fleet = None
     try:
-        libraries = Config(args.config).read()
+        with stats.phase("config"):
+            if args.configs:
+                fleet = Fleet.from_pattern(args.configs)
+                libraries = fleet.libraries
+            elif args.discover:
+                libraries = LibraryDiscovery.for_config(
+                    args.steam_dir, args.config
+                ).discover()
+            else:
+                libraries = Config(args.config).read()
     except ConfigFileError as exc:
         print("ERROR:", exc.args[0])
         sys.exit(1)
+    except (DiscoveryError, FleetError) as exc:
+        print("ERROR:", ": ".join(exc.args))
+        sys.exit(1)
+    if fleet is not None:
+        for config_file, error in fleet.errors.items():
+            print(f"ERROR: {error}: {config_file}")
+    return libraries, fleet
+
+
+def process_libraries(
+    args: argparse.Namespace,
+    setup: RunSetup,
+    stats: RunStats,
+    journal: Optional[Journal] = None,
+    profiler: Optional["Profiler"] = None
+) -> None:
+    """Run set, plan or run command for libraries and watch them.
+
+    The thread pool is only created for the steps that use it, devices
+    and asyncio process manifests of a run without it.
+    """
+    pool = None
+    try:
+        if args.command == "set":
+            pool = get_pool(args.jobs)
+            with stats.phase("set"):
+                set_values(
+                    setup.libraries, args.values, pool, args.dry_run, journal
+                )
+        elif args.command == "plan" or args.dry_run:
+            pool = get_pool(args.jobs)
+            with stats.phase("plan"):
+                plan_changes(
+                    setup.libraries,
+                    get_plan(args),
+                    setup.priority,
+                    pool,
+                    setup.index,
+                    args.dry_run
+                )
+        else:
+            if not (args.per_device or args.async_limit):
+                pool = get_pool(args.jobs)
+            update_priorities(args, setup, stats, pool, journal, profiler)
+        if args.stats:
+            write_stats(stats, args.stats)
+        if args.watch:
+            if pool is None:
+                pool = get_pool(args.jobs)
+            watch_libraries(
+                get_watcher(setup.libraries, args.watch_delay),
+                setup.priority,
+                pool,
+                setup.index,
+                journal
+            )
+    finally:
+        if journal is not None and not journal.failed:
+            flush_journal(journal)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def update_priorities(
+    args: argparse.Namespace,
+    setup: RunSetup,
+    stats: RunStats,
+    pool: Optional["Executor"] = None,
+    journal: Optional[Journal] = None,
+    profiler: Optional["Profiler"] = None
+) -> None:
+    """Update priority of all manifests, write results and summary."""
+    scheduler = None
+    if args.per_device:
+        from ..devices import DeviceScheduler
+        scheduler = DeviceScheduler(args.per_device)
+    urgency = None
+    if args.urgent_first:
+        from ..urgency import UrgencyQueue
+        urgency = UrgencyQueue()
+    writer = get_writer(args.output_format, args.quiet)
+    retry = RetryQueue(setup.priority, args.retries, index=setup.index)
+    totals = RunTotals(args.games)
+    try:
+        runs = iter_libraries(
+            setup.libraries,
+            setup.priority,
+            pool,
+            setup.index,
+            scheduler,
+            args.async_limit,
+            urgency
+        )
+        if profiler is not None:
+            runs = profiler.staged(runs, "scan")
+        for run in runs:
+            write_run(run, writer, stats, retry, journal, totals)
+        if profiler is not None:
+            profiler.snapshot("manifests")
+        if urgency is not None:
+            writer.urgent(urgency.urgent, urgency.fixed, urgency.fixed_after)
+            stats.urgent = urgency.to_dict()
+        if retry:
+            retry_manifests(retry, writer, stats, journal, totals)
+            writer.contended(retry.contended)
+            if profiler is not None:
+                profiler.snapshot("retries")
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown()
+    save_results(args, setup, stats, totals, writer, journal)
+    if scheduler is not None:
+        stats.devices.extend(
+            queue.to_dict() for queue in scheduler.queues.values()
+        )
+    write_summary(writer, setup, totals, journal, scheduler)
+
+
+def save_results(
+    args: argparse.Namespace,
+    setup: RunSetup,
+    stats: RunStats,
+    totals: RunTotals,
+    writer: ResultWriter,
+    journal: Optional[Journal] = None
+) -> None:
+    """Write journal, state index and game index after a run.
+
+    Errors are reported by writer to keep them in order with results.
+    """
+    if journal is not None:
+        with stats.phase("journal"):
+            flush_journal(journal, writer)
+    if setup.index is not None:
+        with stats.phase("index"):
+            save_index(setup.index, writer)
+    if args.games:
+        with stats.phase("games"):
+            refresh_games(
+                args.config, setup.libraries, totals.games, writer
+            )
+
+
+def write_summary(
+    writer: ResultWriter,
+    setup: RunSetup,
+    totals: RunTotals,
+    journal: Optional[Journal] = None,
+    scheduler: Optional["DeviceScheduler"] = None
+) -> None:
+    """Write summary of devices, config files, journal and run."""
+    if scheduler is not None:
+        for device_queue in scheduler.queues.values():
+            writer.device(device_queue)
+    if setup.fleet is not None:
+        for config_file, paths in setup.fleet.configs.items():
+            writer.config(
+                config_file,
+                sum(totals.updates.get(path, 0) for path in paths),
+                len(paths)
+            )
+    if journal is not None and journal.count and not journal.failed:
+        writer.journal(journal.run, journal.count)
+    writer.summary(totals.updated, len(setup.libraries))
+
+
+def write_run(
+    run: LibraryRun,
+    writer: ResultWriter,
+    stats: RunStats,
+    retry: RetryQueue,
+    journal: Optional[Journal],
+    totals: RunTotals
+) -> None:
+    """Write results of library run and retry manifests already due."""
+    lib = run.library
+    stats.add_phase("listing", run.listing_time, lib.path)
+    if run.error is not None:
+        stats.add_library_error("OSError", lib.path)
+        writer.library_error(lib, run.error)
+        return
+    stats.add_count("listed", len(run.manifests), lib.path)
+    totals.library(lib)
+    with stats.phase("process", lib.path):
+        writer.library(lib)
+        for result in run.results:
+            stats.add_result(result, lib.path)
+            if journal is not None:
+                record_edits(journal, result.path, result.edits, writer)
+            if result.contended:
+                retry.defer(result, lib)
+            totals.add(lib, result)
+            with stats.phase("output", lib.path):
+                writer.result(result)
+    if retry.due():
+        retry_manifests(retry, writer, stats, journal, totals, False)
+
+
+def get_pool(jobs: int) -> Optional["Executor"]:
+    """Return thread pool if more than one job should run at once."""
+    if jobs < 2:
+        return None
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(jobs)
+
+
+def get_plan(args: argparse.Namespace) -> "Plan":
+    """Return plan given by arguments or the one next to the config."""
+    from ..plan import Plan
+    return Plan(args.plan) if args.plan else Plan.for_config(args.config)
+
+
+def retry_manifests(
+    retry: RetryQueue,
+    writer: ResultWriter,
+    stats: RunStats,
+    journal: Optional[Journal],
+    totals: RunTotals,
+    wait: bool = True
+) -> None:
+    """Write results of retried manifests and add them to totals.
+
+    Unless wait, only manifests already due are retried.
+    """
+    writer.retries(len(retry) if wait else retry.due())
+    with stats.phase("retry"):
+        for lib, result in retry.run(wait):
+            stats.add_result(result, lib.path)
+            if journal is not None:
+                record_edits(journal, result.path, result.edits, writer)
+            totals.add(lib, result)
+            writer.retry_result(lib, result)
+
+
+def handle_result(
+    result: ManifestResult,
+    index: Optional[StateIndex] = None,
+    show_skipped: bool = True
+) -> bool:
+    """Print result, record its state and return if it was updated."""
+    if index is not None and result.state is not None:
+        index.entries[result.path] = result.state
+    details = f" ({', '.join(result.changed)})" if result.changed else ""
+    if result.error is not None:
+        print("    ERROR:", result.error)
+    elif result.updated:
+        print(f"    Updated '{result.title}'{details}")
+    elif result.changed:
+        print(f"    Would update '{result.title}'{details}")
+    elif show_skipped:
+        print(f"    Skipped '{result.title}'")
+    return result.updated
+
+
+def watch_libraries(
+    watcher: LibraryWatcher,
+    priority: Priority,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None,
+    journal: Optional[Journal] = None
+) -> None:
+    """Update priority of changed manifests until interrupted."""
+    print(f"Watching {len(watcher.libraries)} libraries for changes.")
+    try:
+        with watcher as active:
+            for changed in active.batches():
+                results = update_manifests(changed, priority, pool, index)
+                for result in results:
+                    handle_result(result, index, show_skipped=False)
+                    if journal is not None:
+                        record_edits(journal, result.path, result.edits)
+                if index is not None:
+                    save_index(index)
+                if journal is not None:
+                    flush_journal(journal)
+    except KeyboardInterrupt:
+        print("Exiting Application.")
+        sys.exit(99)
+
+
+def set_values(
+    libraries: List[SteamLibrary],
+    values: Dict[str, str],
+    pool: Optional["Executor"] = None,
+    dry_run: bool = False,
+    journal: Optional[Journal] = None
+) -> None:
+    """Set AppState keys of all manifests in libraries to values."""
     update_count = 0
     for lib in libraries:
         try:
@@ -74,25 +739,233 @@ def main() -> None:
             print(f"ERROR: unable to fetch manifests in '{lib.path}'")
             continue
         print(f"=== Steam Library: {lib}")
-        for manifest_path in manifest_files:
-            try:
-                manifest = ManifestHandler(manifest_path)
-                if manifest.update_priority == args.update_priority:
-                    print(f"    Skipped '{manifest.game_title}'")
-                else:
-                    manifest.write_new_update_priority(args.update_priority)
-                    print(f"    Updated '{manifest.game_title}'")
-                    update_count += 1
-            except ManifestFileError as exc:
-                print("    ERROR:", ": ".join(exc.args))
-            except ManifestKeyError:
-                print("    ERROR: unable to parse manifest file content")
+        for result in edit_manifests(manifest_files, values, pool, dry_run):
+            update_count += handle_result(result)
+            if journal is not None:
+                record_edits(journal, result.path, result.edits)
+    if journal is not None:
+        report_journal(journal)
     exit_msg = f"Updated {update_count} games in {len(libraries)} libraries."
     if update_count > 0:
         exit_msg += " Restart Steam for changes to take effect."
     print(exit_msg)
 
 
+def plan_changes(
+    libraries: List[SteamLibrary],
+    plan: "Plan",
+    priority: Priority,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None,
+    dry_run: bool = False
+) -> None:
+    """Print changes needed in libraries and write them to plan file."""
+    from ..plan import PlanEntry, PlanFileError, plan_manifests
+    for lib in libraries:
+        try:
+            manifest_files = lib.get_appmanifest_list()
+        except OSError:
+            print(f"ERROR: unable to fetch manifests in '{lib.path}'")
+            continue
+        print(f"=== Steam Library: {lib}")
+        for planned in plan_manifests(manifest_files, priority, pool, index):
+            if isinstance(planned, PlanEntry):
+                plan.entries.append(planned)
+                print(
+                    f"    Planned '{planned.title}'"
+                    f" ({planned.old} -> {planned.new})"
+                )
+            else:
+                handle_result(planned)
+    exit_msg = f"Planned {len(plan.entries)} changes."
+    if not dry_run:
+        try:
+            plan.save()
+        except PlanFileError as exc:
+            print("ERROR:", ": ".join(exc.args))
+            sys.exit(1)
+        exit_msg += f" Plan written to '{plan.file}'."
+    print(exit_msg)
+
+
+def apply_changes(
+    plan: "Plan",
+    jobs: int = 1,
+    dry_run: bool = False,
+    journal: Optional[Journal] = None
+) -> None:
+    """Apply changes of plan file and print the result of each entry."""
+    from ..plan import PlanFileError, apply_plan
+    try:
+        plan.load()
+    except PlanFileError as exc:
+        print("ERROR:", ": ".join(exc.args))
+        sys.exit(1)
+    update_count = 0
+    pool = get_pool(jobs)
+    try:
+        for result in apply_plan(plan, pool, dry_run):
+            title = result.entry.title
+            if result.error is not None:
+                print("ERROR:", result.error)
+            elif result.changed:
+                print(f"Skipped '{title}' (changed since plan was created)")
+            elif result.applied:
+                update_count += 1
+                print(f"Updated '{title}'")
+                if journal is not None:
+                    record_edits(journal, result.entry.path, result.edits)
+            else:
+                print(f"Would update '{title}'")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if journal is not None:
+        report_journal(journal)
+    exit_msg = f"Updated {update_count} of {len(plan.entries)} planned games."
+    if update_count > 0:
+        exit_msg += " Restart Steam for changes to take effect."
+    print(exit_msg)
+
+
+def rollback_changes(
+    journal: Journal,
+    run: Optional[str] = None,
+    dry_run: bool = False,
+    record: bool = True
+) -> None:
+    """Restore values changed by run and print result per manifest.
+
+    Restored values are recorded in the journal as a new run if record.
+    """
+    try:
+        entries = journal.entries(run)
+    except JournalError as exc:
+        print("ERROR:", ": ".join(exc.args))
+        sys.exit(1)
+    if not entries:
+        print(f"ERROR: no changes of run '{run or 'last'}' found in journal")
+        sys.exit(1)
+    run = entries[0].run
+    restore_count = manifest_count = 0
+    for result in rollback(entries, dry_run):
+        manifest_count += 1
+        details = ", ".join(
+            f"{entry.key}: {entry.new} -> {entry.old}"
+            for entry in result.entries
+        )
+        if result.error is not None:
+            print("ERROR:", result.error)
+        elif result.restored_before:
+            print(f"Skipped '{result.path}' (already restored)")
+        elif result.changed:
+            print(f"Skipped '{result.path}' (changed since run)")
+        elif result.restored:
+            restore_count += 1
+            print(f"Restored '{result.path}' ({details})")
+            if record:
+                record_edits(journal, result.path, result.edits)
+        else:
+            restore_count += 1
+            print(f"Would restore '{result.path}' ({details})")
+    exit_msg = (
+        f"{'Would restore' if dry_run else 'Restored'} {restore_count}"
+        f" of {manifest_count} games changed by run '{run}'."
+    )
+    if restore_count > 0 and not dry_run:
+        exit_msg += " Restart Steam for changes to take effect."
+    if record:
+        report_journal(journal)
+    print(exit_msg)
+
+
+def report_journal(journal: Journal) -> None:
+    """Write buffered journal entries and print their run ID."""
+    flush_journal(journal)
+    if journal.count and not journal.failed:
+        print(f"Recorded {journal.count} changes as run '{journal.run}'.")
+
+
+def record_edits(
+    journal: Journal,
+    path: str,
+    edits: Iterable[Edit],
+    writer: Optional[ResultWriter] = None
+) -> None:
+    """Record edits in journal and report error if writing fails."""
+    try:
+        journal.record_edits(path, edits)
+    except JournalError as exc:
+        report_error(exc, writer)
+
+
+def flush_journal(
+    journal: Journal, writer: Optional[ResultWriter] = None
+) -> None:
+    """Write buffered journal entries and report error if it fails."""
+    try:
+        journal.flush()
+    except JournalError as exc:
+        report_error(exc, writer)
+
+
+def save_index(
+    index: StateIndex, writer: Optional[ResultWriter] = None
+) -> None:
+    """Save index and report error if it cannot be written."""
+    try:
+        index.save()
+    except StateIndexError as exc:
+        report_error(exc, writer)
+
+
+def refresh_games(
+    config_file: str,
+    libraries: List[SteamLibrary],
+    results: Dict[str, Dict[str, ManifestResult]],
+    writer: Optional[ResultWriter] = None
+) -> None:
+    """Refresh game index from results and report error if it fails."""
+    from ..games import GameIndex, GameIndexError
+    try:
+        GameIndex.for_config(config_file).refresh(
+            [lib.path for lib in libraries],
+            {path: list(found.values()) for path, found in results.items()}
+        )
+    except GameIndexError as exc:
+        report_error(exc, writer)
+
+
+def report_error(
+    exc: Exception, writer: Optional[ResultWriter] = None
+) -> None:
+    """Write error of exception with writer or print it without one."""
+    if writer is None:
+        print("ERROR:", ": ".join(exc.args))
+    else:
+        writer.error(": ".join(exc.args))
+
+
+def verify_index(index: StateIndex) -> None:
+    """Remove entries not matching their manifest and save index."""
+    invalid = [
+        path for path, state in index.entries.items()
+        if not verify_state(path, state)
+    ]
+    for path in invalid:
+        print(f"    Invalid entry '{path}'")
+        del index.entries[path]
+    try:
+        index.save()
+    except StateIndexError as exc:
+        print("ERROR:", ": ".join(exc.args))
+        sys.exit(1)
+    print(
+        f"Verified {len(index.entries) + len(invalid)} index entries."
+        f" Removed {len(invalid)} invalid entries."
+    )
+
+
 if __name__ == '__main__':
     # sys.argv[0] = sys.argv[0].replace("ssdk.py", SSDK_BG + ".py")
     main()
@@ -14,11 +14,15 @@
 """Module for interacting with config."""
 
 import os
-from typing import IO, List, Union
+import stat
+import sys
+from typing import IO, Dict, Iterable, List, Tuple, Union
 
 from .core.models import SteamLibrary
 from .core.utils import get_abspath
 
+ISDIR_WORKERS = 16
+
 CONFIG_PREFIX = """\
 ##
 #   This file was generated by steam-scheduled-download-killer (ssdk).
@@ -36,8 +40,17 @@ class ConfigFileError(Exception):
     """Exception for errors during config file interaction."""
 
 
+_cache: Dict[str, Tuple[Tuple[int, int], List[str]]] = {}
+
+
 class Config:
-    """Handler for interacting with files listing Steam Libraries."""
+    """Handler for interacting with files listing Steam Libraries.
+
+    Parsed config files are cached for the lifetime of the process and
+    only read again once their modification time or size changes.
+    Given library paths are normalized and deduplicated in order, and
+    all of them are checked for existence at once before writing.
+    """
 
     def __init__(self, file: str) -> None:
         """Initialize handler for given config file."""
@@ -49,51 +62,56 @@ class Config:
 
     def write(
         self,
-        lib_dirs: Union[str, List[str]],
+        lib_dirs: Union[str, Iterable[str]],
         overwrite_existing: bool = True
     ) -> None:
         """Write list of Steam Library Directories to config file."""
         if os.path.isfile(self.file) and not overwrite_existing:
             raise ConfigFileError("config file already exists", self.file)
-        libs = []
-        for lib in self._get_lib_dir_list(lib_dirs):
-            lib_path = get_abspath(lib)
-            if not os.path.isdir(lib_path):
-                print(f"'{lib_path}' is not a directory")
+        libs, messages = [], []
+        lib_paths = self._get_lib_paths(lib_dirs)
+        for lib_path, is_dir in self._check_dirs(lib_paths).items():
+            if not is_dir:
+                messages.append(f"'{lib_path}' is not a directory")
             else:
                 libs.append(lib_path)
-                print(f"Adding '{lib_path}' to config")
+                messages.append(f"Adding '{lib_path}' to config")
         if libs:
             self._write(libs)
-            print(f"Created config file at '{self.file}'")
+            messages.append(f"Created config file at '{self.file}'")
+        _print_lines(messages)
 
-    def remove(self, lib_dirs: Union[str, List[str]]):
+    def remove(self, lib_dirs: Union[str, Iterable[str]]):
         """Remove Steam Library Directory from config file."""
-        cfg_libs = self._read()
-        lib_dirs = self._get_lib_dir_list(lib_dirs)
-        for lib in lib_dirs:
-            lib_path = get_abspath(lib)
+        cfg_libs = dict.fromkeys(self._read())
+        messages = []
+        for lib_path in self._get_lib_paths(lib_dirs):
             if lib_path not in cfg_libs:
-                print(f"Unable to find '{lib_path}' in config")
+                messages.append(f"Unable to find '{lib_path}' in config")
             else:
-                cfg_libs.remove(lib_path)
-                print(f"Removing '{lib_path}' from config")
-        self._write(cfg_libs)
+                del cfg_libs[lib_path]
+                messages.append(f"Removing '{lib_path}' from config")
+        self._write(list(cfg_libs))
+        _print_lines(messages)
 
-    def add(self, lib_dirs: Union[str, List[str]]) -> None:
+    def add(self, lib_dirs: Union[str, Iterable[str]]) -> None:
         """Add Steam Library Directory to config file."""
-        cfg_libs = self._read()
-        lib_dirs = self._get_lib_dir_list(lib_dirs)
-        for lib in lib_dirs:
-            lib_path = get_abspath(lib)
+        cfg_libs = dict.fromkeys(self._read())
+        messages = []
+        new_paths = []
+        for lib_path in self._get_lib_paths(lib_dirs):
             if lib_path in cfg_libs:
-                print(f"'{lib_path}' is already in config")
-            elif not os.path.isdir(lib_path):
-                print(f"'{lib_path}' is not a directory")
+                messages.append(f"'{lib_path}' is already in config")
+            else:
+                new_paths.append(lib_path)
+        for lib_path, is_dir in self._check_dirs(new_paths).items():
+            if not is_dir:
+                messages.append(f"'{lib_path}' is not a directory")
             else:
-                cfg_libs.append(lib_path)
-                print(f"Adding '{lib_path}' to config")
-        self._write(cfg_libs)
+                cfg_libs[lib_path] = None
+                messages.append(f"Adding '{lib_path}' to config")
+        self._write(list(cfg_libs))
+        _print_lines(messages)
 
     def _open(self, filemode="r", encoding="utf-8") -> IO:
         """Open config file with specified mode and encoding."""
@@ -104,31 +122,80 @@ class Config:
 
     def _read(self) -> List[str]:
         """Read list of Steam Library Directories from config file."""
-        if not os.path.isfile(self.file):
+        try:
+            file_stat = os.stat(self.file)
+        except OSError:
+            file_stat = None
+        if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
             raise ConfigFileError("config file doesn't exist", self.file)
+        fingerprint = file_stat.st_mtime_ns, file_stat.st_size
+        cached = _cache.get(key := os.path.abspath(self.file))
+        if cached is not None and cached[0] == fingerprint:
+            return list(cached[1])
         with self._open() as cfg_file:
             lib_dirs = [
                 line.strip() for line in cfg_file.readlines()
                 if line.strip() and not line.startswith("#")
             ]
-        return lib_dirs
+        _cache[key] = fingerprint, lib_dirs
+        return list(lib_dirs)
 
     def _write(self, lib_dirs: List[str]):
-        """Write list of Steam Library Directories to config file."""
-        if not os.path.isdir(cfg_dir := os.path.dirname(self.file)):
+        """Replace config file atomically with Steam Library Dirs."""
+        cfg_dir = os.path.dirname(self.file)
+        if cfg_dir and not os.path.isdir(cfg_dir):
             try:
                 os.makedirs(cfg_dir)
             except OSError as exc:
                 raise ConfigFileError(
                     "cannot create config dir", cfg_dir
                 ) from exc
-        with self._open("w") as cfg_file:
-            lib_dirs.insert(0, CONFIG_PREFIX)
-            cfg_file.write("\n".join(lib_dirs))
+        tmp_file = self.file + ".tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as cfg_file:
+                cfg_file.write("\n".join([CONFIG_PREFIX, *lib_dirs]))
+            os.replace(tmp_file, self.file)
+        except OSError as exc:
+            raise ConfigFileError("cannot access config", self.file) from exc
+        _cache.pop(os.path.abspath(self.file), None)
+
+    @staticmethod
+    def _get_lib_paths(lib_dirs: Union[str, Iterable[str]]) -> List[str]:
+        """Return unique absolute paths of lib_dirs in given order."""
+        if isinstance(lib_dirs, str):
+            lib_dirs = [lib_dirs]
+        return list(dict.fromkeys(get_abspath(lib) for lib in lib_dirs))
 
     @staticmethod
-    def _get_lib_dir_list(lib_dirs: Union[str, List[str]]) -> List[str]:
-        """Return lib_dirs as single element list if given as str."""
-        if isinstance(lib_dirs, list):
-            return lib_dirs
-        return [lib_dirs]
+    def _check_dirs(lib_paths: List[str]) -> Dict[str, bool]:
+        """Return if each path is a directory, checked concurrently."""
+        if len(lib_paths) < 2:
+            return {path: os.path.isdir(path) for path in lib_paths}
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(min(ISDIR_WORKERS, len(lib_paths))) as pool:
+            return dict(zip(lib_paths, pool.map(os.path.isdir, lib_paths)))
+
+
+def read_lib_dirs(file: str) -> List[str]:
+    """Read paths listed one per line in file or stdin if file is '-'.
+
+    Empty lines and lines starting with '#' are skipped.
+    """
+    try:
+        if file == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with open(file, "r", encoding="utf-8") as list_file:
+                lines = list_file.readlines()
+    except OSError as exc:
+        raise ConfigFileError("cannot access library list", file) from exc
+    return [
+        line.strip() for line in lines
+        if line.strip() and not line.startswith("#")
+    ]
+
+
+def _print_lines(lines: List[str]) -> None:
+    """Print all lines with a single write."""
+    if lines:
+        print("\n".join(lines))
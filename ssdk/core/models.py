@@ -13,30 +13,46 @@
 
 """Data Models for steam-scheduled-download-killer."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
-from typing import List
+from typing import List, Optional
+
+from .utils import is_appmanifest
 
 
 @dataclass(repr=True)
 class SteamLibrary:
-    """Container for a Steam Library."""
+    """Container for a Steam Library.
+
+    The list of appmanifest files is cached after the first listing of
+    the Steam Library Folder. Use refresh() to list the folder again.
+    """
 
     path: str
+    _manifests: Optional[List[str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def get_appmanifest_list(self) -> List[str]:
         """List all appmanifest.acf files in Steam Library Folder."""
-        manifests = [
-            os.path.join(self.path, man) for man in os.listdir(self.path)
-            if os.path.isfile(os.path.join(self.path, man))
-            and man.startswith("appmanifest_") and man.endswith(".acf")
-        ]
-        return manifests
+        if self._manifests is None:
+            self.refresh()
+        return list(self._manifests)
+
+    def refresh(self) -> None:
+        """List Steam Library Folder again and update its manifests."""
+        with os.scandir(self.path) as entries:
+            self._manifests = [
+                entry.path for entry in entries
+                if is_appmanifest(entry.name) and entry.is_file()
+            ]
 
     @property
     def game_count(self) -> int:
         """Return number of games found in Steam Library Folder."""
-        return len(self.get_appmanifest_list())
+        if self._manifests is None:
+            self.refresh()
+        return len(self._manifests)
 
     def __str__(self) -> str:
         """Return string with library path and number of manifests."""
@@ -15,12 +15,19 @@
 
 import argparse
 import os
+from typing import Callable, Union
 
 
 class BaseArgumentParser(argparse.ArgumentParser):
-    """Command Line Parser with attribute for config file."""
+    """Command Line Parser with attribute for config file.
 
-    def __init__(self, prog: str, desc: str, epilog: str):
+    The epilog can be given as a function, which is only called once the
+    help message is actually shown.
+    """
+
+    def __init__(
+        self, prog: str, desc: str, epilog: Union[str, Callable[[], str]]
+    ):
         """Initialize the argparse.Argumentparser and add arguments."""
         super().__init__(
             prog=prog,
@@ -33,6 +40,22 @@ class BaseArgumentParser(argparse.ArgumentParser):
             help="path to config file containing Steam Library Folder(s)",
             default=os.path.expanduser(r"~\AppData\Local\python-ssdk\ssdk.cfg")
         )
+        self.add_argument(
+            "--stats",
+            help="write JSON report of timings and counts ('-' for stdout)",
+            metavar="FILE"
+        )
+        self.add_argument(
+            "--profile",
+            help="write cProfile and tracemalloc output of run to directory",
+            metavar="DIR"
+        )
+
+    def format_help(self) -> str:
+        """Create epilog if it wasn't created yet and return help."""
+        if callable(self.epilog):
+            self.epilog = self.epilog()
+        return super().format_help()
 
 
 class OneLineHelpFormatter(argparse.RawTextHelpFormatter):
@@ -54,6 +77,37 @@ def get_abspath(path: str) -> str:
     return os.path.normpath(path)
 
 
+def is_appmanifest(filename: str) -> bool:
+    """Return True if filename is the name of an appmanifest file."""
+    return filename.startswith("appmanifest_") and filename.endswith(".acf")
+
+
+def positive_float(value: str) -> float:
+    """Convert command line argument to float greater than zero."""
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+    if not number > 0:
+        raise argparse.ArgumentTypeError(
+            f"invalid positive float value: '{value}'"
+        )
+    return number
+
+
+def positive_int(value: str) -> int:
+    """Convert command line argument to integer greater than zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            f"invalid positive int value: '{value}'"
+        )
+    return number
+
+
 def get_filepath_without_extension(filepath: str) -> str:
     """Strip dirname and file extension from given filepath."""
     if os.path.isdir(filepath):
@@ -0,0 +1,126 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Scheduling of manifest processing with one worker queue per device.
+
+Libraries on the same device share a queue with a fixed number of
+workers, so a spinning disk isn't hit by more concurrent reads than it
+handles well, while libraries on different devices are processed in
+parallel. Manifests are queued in the order their directory lists them.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .core.models import SteamLibrary
+from .runner import ManifestResult, Priority, update_manifest
+from .state import StateIndex
+
+
+class DeviceQueue:
+    """Worker queue processing the manifests of a single device.
+
+    The queue counts processed manifests and bytes and keeps the time
+    between the first submission and the last finished manifest.
+    """
+
+    def __init__(self, device: int, workers: int) -> None:
+        """Initialize queue with given number of workers."""
+        self.device = device
+        self.pool = ThreadPoolExecutor(
+            workers, thread_name_prefix=f"ssdk-device-{device}"
+        )
+        self.libraries: List[str] = []
+        self.manifests = 0
+        self.bytes = 0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def submit(
+        self,
+        paths: Iterable[str],
+        priority: Priority,
+        index: Optional[StateIndex] = None
+    ) -> Iterator[ManifestResult]:
+        """Queue manifests and return iterator over results in order."""
+        if self.started is None:
+            self.started = time.perf_counter()
+        return self.pool.map(self._run, paths, repeat(priority), repeat(index))
+
+    @property
+    def seconds(self) -> float:
+        """Return seconds between first submission and last result."""
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def to_dict(self) -> Dict:
+        """Return counters and throughput as dict for JSON report."""
+        seconds = self.seconds
+        return {
+            "device": self.device,
+            "libraries": list(self.libraries),
+            "manifests": self.manifests,
+            "bytes": self.bytes,
+            "seconds": seconds,
+            "manifests_per_second": self.manifests / seconds if seconds else 0
+        }
+
+    def __str__(self) -> str:
+        """Return throughput summary of device."""
+        rate = self.manifests / self.seconds if self.seconds else 0
+        return (
+            f"Device {self.device} ({len(self.libraries)} libraries):"
+            f" {self.manifests} manifests in {self.seconds:.2f}s"
+            f" ({rate:.0f} manifests/s, {self.bytes / 1024:.0f} KiB)"
+        )
+
+    def _run(
+        self, path: str, priority: Priority, index: Optional[StateIndex]
+    ) -> ManifestResult:
+        """Process manifest and add it to the counters."""
+        result = update_manifest(path, priority, index)
+        with self.lock:
+            self.manifests += 1
+            self.bytes += result.bytes_read + result.bytes_written
+            self.finished = time.perf_counter()
+        return result
+
+
+class DeviceScheduler:
+    """Dispatcher assigning each library to the queue of its device."""
+
+    def __init__(self, workers: int) -> None:
+        """Initialize scheduler with workers for each device queue."""
+        self.workers = workers
+        self.queues: Dict[int, DeviceQueue] = {}
+
+    def get_queue(self, lib: SteamLibrary) -> DeviceQueue:
+        """Return queue of device library is stored on."""
+        device = os.stat(lib.path).st_dev
+        if device not in self.queues:
+            self.queues[device] = DeviceQueue(device, self.workers)
+        queue = self.queues[device]
+        if lib.path not in queue.libraries:
+            queue.libraries.append(lib.path)
+        return queue
+
+    def shutdown(self) -> None:
+        """Shut down the workers of all queues."""
+        for queue in self.queues.values():
+            queue.pool.shutdown(cancel_futures=True)
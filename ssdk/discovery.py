@@ -0,0 +1,147 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Discovery of Steam Library Folders from Steam's libraryfolders.vdf.
+
+Steam lists every library it knows in steamapps/libraryfolders.vdf of
+its installation directory. Newer versions of the file contain a
+section with a 'path' key for each library, older versions the path
+itself. The resolved folders are cached together with the modification
+time of the file, so the file is only parsed and validated again once
+it changes.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+from . import vdf
+from .core.models import SteamLibrary
+from .core.utils import get_abspath
+
+CACHE_FILENAME = "ssdk-discovery.json"
+CACHE_VERSION = 1
+LIBRARY_FOLDERS = os.path.join("steamapps", "libraryfolders.vdf")
+DEFAULT_STEAM_DIR = os.path.join(
+    os.environ.get("ProgramFiles(x86)", r"C:\Program Files (x86)"), "Steam"
+)
+
+
+class DiscoveryError(Exception):
+    """Exception for errors during library discovery."""
+
+
+class LibraryDiscovery:
+    """Resolver for Steam Library Folders of a Steam installation."""
+
+    def __init__(self, steam_dir: str, cache_file: str) -> None:
+        """Initialize discovery for Steam installed in steam_dir."""
+        self.steam_dir = get_abspath(steam_dir)
+        self.file = os.path.join(self.steam_dir, LIBRARY_FOLDERS)
+        self.cache_file = cache_file
+
+    @classmethod
+    def for_config(
+        cls, steam_dir: str, config_file: str
+    ) -> "LibraryDiscovery":
+        """Return discovery caching its result next to a config file."""
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        return cls(steam_dir, os.path.join(config_dir, CACHE_FILENAME))
+
+    def discover(self) -> List[SteamLibrary]:
+        """Return libraries from cache or from libraryfolders.vdf.
+
+        If the file was parsed, the result is written to the cache. A
+        cache that cannot be written is ignored.
+        """
+        try:
+            mtime = os.stat(self.file).st_mtime_ns
+        except OSError as exc:
+            raise DiscoveryError(
+                "cannot access library folders file", self.file
+            ) from exc
+        lib_dirs = self.load_cache(mtime)
+        if lib_dirs is None:
+            lib_dirs = self.read_library_folders()
+            try:
+                self.save_cache(mtime, lib_dirs)
+            except OSError:
+                pass
+        return [SteamLibrary(lib) for lib in lib_dirs]
+
+    def read_library_folders(self) -> List[str]:
+        """Parse libraryfolders.vdf and return existing folders."""
+        try:
+            with open(self.file, "rb") as folders_file:
+                data = vdf.parse(folders_file.read())
+        except OSError as exc:
+            raise DiscoveryError(
+                "cannot access library folders file", self.file
+            ) from exc
+        except vdf.VdfSyntaxError as exc:
+            raise DiscoveryError(
+                "unable to parse library folders file", self.file
+            ) from exc
+        lib_dirs = {os.path.join(self.steam_dir, "steamapps"): None}
+        for path in _get_library_paths(data):
+            lib_dirs[os.path.join(get_abspath(path), "steamapps")] = None
+        return [lib for lib in lib_dirs if os.path.isdir(lib)]
+
+    def load_cache(self, mtime: int) -> Optional[List[str]]:
+        """Return cached folders if cache matches file and mtime."""
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+            if (
+                data.get("version") != CACHE_VERSION
+                or data["file"] != self.file
+                or data["mtime"] != mtime
+            ):
+                return None
+            return [str(lib) for lib in data["libraries"]]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save_cache(self, mtime: int, lib_dirs: List[str]) -> None:
+        """Write folders resolved from file with mtime to cache."""
+        data = {
+            "version": CACHE_VERSION,
+            "file": self.file,
+            "mtime": mtime,
+            "libraries": lib_dirs
+        }
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(tmp_file, self.cache_file)
+
+
+def _get_library_paths(data: vdf.KeyValues) -> List[str]:
+    """Return library paths listed in parsed libraryfolders.vdf."""
+    folders: Dict = next(
+        (
+            section for key, section in data.items()
+            if key.lower() == "libraryfolders" and isinstance(section, dict)
+        ),
+        {}
+    )
+    paths = []
+    for key, entry in folders.items():
+        if not key.isdigit():
+            continue
+        if isinstance(entry, dict):
+            entry = entry.get("path")
+        if isinstance(entry, vdf.Value):
+            paths.append(entry.text)
+    return paths
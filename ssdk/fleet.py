@@ -0,0 +1,107 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Handling of many config files processed in a single run.
+
+The config files are given either by a glob pattern or by a file listing
+one config file per line. A single config file can be given as well.
+Libraries appearing in more than one config are only processed once.
+"""
+
+import glob
+import os
+from typing import Dict, List
+
+from .config import Config, ConfigFileError
+from .core.models import SteamLibrary
+from .core.utils import get_abspath
+
+GLOB_CHARS = frozenset("*?[")
+
+
+class FleetError(Exception):
+    """Exception for errors during lookup of config files."""
+
+
+class Fleet:
+    """Libraries of several config files without duplicates.
+
+    Configs maps each readable config file to the paths of its
+    libraries, errors each unreadable config file to the reason.
+    """
+
+    def __init__(self, config_files: List[str]) -> None:
+        """Read all given config files."""
+        self.configs: Dict[str, List[str]] = {}
+        self.errors: Dict[str, str] = {}
+        self.libraries: List[SteamLibrary] = []
+        known: Dict[str, SteamLibrary] = {}
+        for config_file in config_files:
+            try:
+                config_libraries = Config(config_file).read()
+            except ConfigFileError as exc:
+                self.errors[config_file] = exc.args[0]
+                continue
+            self.configs[config_file] = []
+            for lib in config_libraries:
+                key = library_key(lib.path)
+                if key not in known:
+                    known[key] = lib
+                    self.libraries.append(lib)
+                self.configs[config_file].append(known[key].path)
+
+    @classmethod
+    def from_pattern(cls, pattern: str) -> "Fleet":
+        """Return fleet of configs matching glob or listed in file."""
+        return cls(find_configs(pattern))
+
+
+def find_configs(pattern: str) -> List[str]:
+    """Return config files matching glob pattern or listed in file.
+
+    Each config file is returned once, in the order of the listing or
+    sorted if a glob pattern is given. A file is a list of config files
+    if it names existing files and no directories, otherwise it is a
+    config file listing Steam Library Folders itself.
+    """
+    if GLOB_CHARS & set(pattern):
+        config_files = sorted(glob.glob(os.path.expanduser(pattern)))
+    else:
+        try:
+            with open(pattern, "r", encoding="utf-8") as list_file:
+                config_files = [
+                    line.strip() for line in list_file
+                    if line.strip() and not line.startswith("#")
+                ]
+        except OSError as exc:
+            raise FleetError("cannot access config list", pattern) from exc
+        if not _is_config_list(config_files):
+            config_files = [pattern]
+    unique = list(dict.fromkeys(get_abspath(file) for file in config_files))
+    if not unique:
+        raise FleetError("no config files found", pattern)
+    return unique
+
+
+def library_key(path: str) -> str:
+    """Return normalized library path used to find duplicates."""
+    return os.path.normcase(get_abspath(path))
+
+
+def _is_config_list(paths: List[str]) -> bool:
+    """Return if paths read from a file name config files."""
+    paths = [get_abspath(path) for path in paths]
+    return (
+        any(map(os.path.isfile, paths))
+        and not any(map(os.path.isdir, paths))
+    )
@@ -0,0 +1,233 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""SQLite index of all games found in the Steam Libraries.
+
+The index is refreshed at the end of an ssdk run from the results of its
+manifests, so no library is listed and no manifest parsed twice. Only
+the size on disk of new manifests and those changed by Steam is read.
+Queries are answered from the index without listing any Steam Library
+Folder.
+"""
+
+import contextlib
+import os
+import sqlite3
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .manifest import ManifestFileError, ManifestHandler, ManifestKeyError
+from .runner import ManifestResult
+
+GAMES_FILENAME = "ssdk-games.db"
+GAMES_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    path TEXT PRIMARY KEY,
+    library TEXT NOT NULL,
+    appid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size_on_disk INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_library ON games (library);
+CREATE INDEX IF NOT EXISTS games_name ON games (name COLLATE NOCASE);
+"""
+
+
+class GameIndexError(Exception):
+    """Exception for errors during game index interaction."""
+
+
+class Game(NamedTuple):
+    """Row of the game index describing a single appmanifest file."""
+
+    path: str
+    library: str
+    appid: str
+    name: str
+    size_on_disk: int
+    priority: int
+    mtime: int
+    size: int
+
+
+class LibraryStats(NamedTuple):
+    """Number of games, their size and priorities in a library."""
+
+    library: str
+    games: int
+    size_on_disk: int
+    priorities: Dict[int, int]
+
+
+class GameIndex:
+    """Handler for the SQLite game index next to a config file."""
+
+    def __init__(self, file: str) -> None:
+        """Initialize handler for given database file."""
+        self.file = file
+
+    @classmethod
+    def for_config(cls, config_file: str) -> "GameIndex":
+        """Return handler for the game index of a config file."""
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        return cls(os.path.join(config_dir, GAMES_FILENAME))
+
+    def refresh(
+        self,
+        libraries: List[str],
+        results: Dict[str, List[ManifestResult]]
+    ) -> int:
+        """Update rows of changed manifests and return their number.
+
+        Results map each listed library to the results of its manifests.
+        Rows of manifests no longer found and of libraries not given are
+        removed. Rows of failed manifests and unlisted libraries are
+        kept.
+        """
+        with self._connect() as connection:
+            changed: List[Game] = []
+            for library, library_results in results.items():
+                known = {
+                    path: Game(*row) for path, *row in connection.execute(
+                        "SELECT path, * FROM games WHERE library = ?",
+                        (library,)
+                    )
+                }
+                for result in library_results:
+                    row = known.pop(result.path, None)
+                    if result.state is None:
+                        continue
+                    try:
+                        game = _get_game(library, result, row)
+                    except (ManifestFileError, ManifestKeyError, OSError):
+                        continue
+                    if game is not None:
+                        changed.append(game)
+                connection.executemany(
+                    "DELETE FROM games WHERE path = ?",
+                    ((path,) for path in known)
+                )
+            connection.executemany(
+                "INSERT OR REPLACE INTO games"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                changed
+            )
+            stored = connection.execute(
+                "SELECT DISTINCT library FROM games"
+            ).fetchall()
+            connection.executemany(
+                "DELETE FROM games WHERE library = ?",
+                (row for row in stored if row[0] not in libraries)
+            )
+        return len(changed)
+
+    def games(self, name: Optional[str] = None) -> List[Game]:
+        """Return all games or those whose name contains given text."""
+        query = "SELECT * FROM games"
+        params: Tuple[str, ...] = ()
+        if name is not None:
+            pattern = name.replace("\\", "\\\\").replace("%", "\\%")
+            query += " WHERE name LIKE ? ESCAPE '\\'"
+            params = ("%" + pattern.replace("_", "\\_") + "%",)
+        query += " ORDER BY library, name COLLATE NOCASE"
+        with self._connect(create=False) as connection:
+            return [Game(*row) for row in connection.execute(query, params)]
+
+    def stats(self) -> List[LibraryStats]:
+        """Return number of games, size and priorities per library."""
+        query = (
+            "SELECT library, priority, COUNT(*), SUM(size_on_disk)"
+            " FROM games GROUP BY library, priority ORDER BY library"
+        )
+        libraries: Dict[str, LibraryStats] = {}
+        with self._connect(create=False) as connection:
+            rows = connection.execute(query).fetchall()
+        for library, priority, count, size in rows:
+            stats = libraries.get(library, LibraryStats(library, 0, 0, {}))
+            stats.priorities[priority] = count
+            libraries[library] = stats._replace(
+                games=stats.games + count,
+                size_on_disk=stats.size_on_disk + size
+            )
+        return list(libraries.values())
+
+    @contextlib.contextmanager
+    def _connect(self, create: bool = True) -> Iterator[sqlite3.Connection]:
+        """Open database, create schema if needed and commit on success.
+
+        Without create, a missing or outdated database is an error.
+        """
+        if not create and not os.path.isfile(self.file):
+            raise GameIndexError("game index doesn't exist", self.file)
+        try:
+            connection = sqlite3.connect(self.file)
+        except sqlite3.Error as exc:
+            raise GameIndexError(
+                "cannot access game index", self.file
+            ) from exc
+        try:
+            with connection:
+                version, = connection.execute("PRAGMA user_version").fetchone()
+                if version != GAMES_VERSION:
+                    if not create:
+                        raise GameIndexError("outdated game index", self.file)
+                    connection.execute("DROP TABLE IF EXISTS games")
+                    connection.executescript(SCHEMA)
+                    connection.execute(
+                        f"PRAGMA user_version = {GAMES_VERSION}"
+                    )
+                yield connection
+        except sqlite3.Error as exc:
+            raise GameIndexError(
+                "cannot access game index", self.file
+            ) from exc
+        finally:
+            connection.close()
+
+
+def _get_game(
+    library: str, result: ManifestResult, known: Optional[Game]
+) -> Optional[Game]:
+    """Return game of result unless its row is still up to date.
+
+    The size on disk is read again whenever the manifest changed, as
+    Steam updates it together with the other keys.
+    """
+    state = result.state
+    if known is not None and (known.mtime, known.size) == (
+        state.mtime, state.size
+    ):
+        return None
+    return Game(
+        result.path,
+        library,
+        state.appid,
+        state.title,
+        _read_size_on_disk(result.path),
+        state.priority,
+        state.mtime,
+        state.size
+    )
+
+
+def _read_size_on_disk(path: str) -> int:
+    """Return SizeOnDisk of manifest at path or 0 if it's invalid."""
+    manifest = ManifestHandler(path, ("SizeOnDisk",))
+    try:
+        return int(manifest.get_value("SizeOnDisk").text)
+    except (ManifestKeyError, ValueError):
+        return 0
@@ -0,0 +1,233 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Journal of all values written to manifests and their rollback.
+
+Each written value is appended to the journal as a single JSON array
+containing run ID, path, key, old and new value as well as modification
+time and size of the manifest after the write. Entries are buffered and
+written with a single fsync per batch. Once the journal exceeds its size
+limit it replaces the previous backup, so at most two files are kept.
+"""
+
+import json
+import os
+import time
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple
+)
+
+from .manifest import ManifestFileError, ManifestHandler, ManifestKeyError
+from .runner import Edit, ManifestResult
+
+JOURNAL_FILENAME = "ssdk-journal.jsonl"
+JOURNAL_MAX_SIZE = 4 * 1024 * 1024
+BATCH_SIZE = 512
+
+
+class JournalError(Exception):
+    """Exception for errors during journal file interaction."""
+
+
+class JournalEntry(NamedTuple):
+    """Value written to a manifest during a run."""
+
+    run: str
+    path: str
+    key: str
+    old: str
+    new: str
+    mtime: int
+    size: int
+
+
+class RollbackResult(NamedTuple):
+    """Outcome of restoring the old values of a single manifest.
+
+    Changed is True if the manifest was modified after the run,
+    restored_before if it already contains the old values. Results
+    neither restored, changed nor failed were only checked in a dry
+    run. Edits lists each restored value, so the rollback can be
+    recorded in the journal as well.
+    """
+
+    path: str
+    entries: List[JournalEntry]
+    restored: bool = False
+    changed: bool = False
+    error: Optional[str] = None
+    restored_before: bool = False
+    edits: Tuple[Edit, ...] = ()
+
+
+class Journal:
+    """Handler for the journal file next to a config file.
+
+    Entries are buffered and appended in batches. Entries of a failed
+    write stay buffered and automatic writes stop until the next
+    explicit flush succeeds.
+    """
+
+    def __init__(
+        self,
+        file: str,
+        run: Optional[str] = None,
+        max_size: int = JOURNAL_MAX_SIZE
+    ) -> None:
+        """Initialize journal for entries of given or a new run ID."""
+        self.file = file
+        self.run = run if run is not None else new_run_id()
+        self.max_size = max_size
+        self.pending: List[str] = []
+        self.count = 0
+        self.failed = False
+
+    @classmethod
+    def for_config(cls, config_file: str) -> "Journal":
+        """Return handler for the journal belonging to a config file."""
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        return cls(os.path.join(config_dir, JOURNAL_FILENAME))
+
+    @property
+    def backup_file(self) -> str:
+        """Return path of the rotated previous journal."""
+        return self.file + ".1"
+
+    def record(self, result: ManifestResult) -> None:
+        """Buffer entries for values written to manifest of result."""
+        self.record_edits(result.path, result.edits)
+
+    def record_edits(self, path: str, edits: Iterable[Edit]) -> None:
+        """Buffer entries for values written to manifest at path."""
+        for edit in edits:
+            self.pending.append(json.dumps(
+                [self.run, path, *edit],
+                ensure_ascii=False,
+                separators=(",", ":")
+            ))
+            self.count += 1
+        if len(self.pending) >= BATCH_SIZE and not self.failed:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append buffered entries to journal and sync it to disk."""
+        if not self.pending:
+            return
+        data = "\n".join(self.pending) + "\n"
+        try:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self.file)), exist_ok=True
+            )
+            if os.path.isfile(self.file) and (
+                os.path.getsize(self.file) + len(data) > self.max_size
+            ):
+                os.replace(self.file, self.backup_file)
+            with open(self.file, "a", encoding="utf-8") as journal_file:
+                journal_file.write(data)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+        except OSError as exc:
+            self.failed = True
+            raise JournalError("cannot write journal", self.file) from exc
+        self.pending.clear()
+        self.failed = False
+
+    def entries(self, run: Optional[str] = None) -> List[JournalEntry]:
+        """Return entries of given run or of the last recorded run."""
+        entries = list(self.read())
+        if run is None and entries:
+            run = entries[-1].run
+        return [entry for entry in entries if entry.run == run]
+
+    def read(self) -> Iterator[JournalEntry]:
+        """Yield all entries of backup and journal in recorded order."""
+        for file in (self.backup_file, self.file):
+            try:
+                with open(file, "r", encoding="utf-8") as journal_file:
+                    lines = journal_file.readlines()
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                raise JournalError("cannot access journal", file) from exc
+            try:
+                for line in lines:
+                    yield JournalEntry(*json.loads(line))
+            except (ValueError, TypeError) as exc:
+                raise JournalError("invalid journal", file) from exc
+
+
+def new_run_id() -> str:
+    """Return ID for a new run from current time and process ID."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def rollback(
+    entries: List[JournalEntry], dry_run: bool = False
+) -> Iterator[RollbackResult]:
+    """Restore old values of entries and yield a result per manifest.
+
+    Only the last entry of each key of a manifest is restored. A
+    manifest is skipped if it already contains the old values or if it
+    changed after the run, that is if its modification time, size or
+    any of the values differ.
+    """
+    manifests: Dict[str, Dict[str, JournalEntry]] = {}
+    for entry in entries:
+        keys = manifests.setdefault(entry.path, {})
+        keys.pop(entry.key, None)  # keep the latest entry last
+        keys[entry.key] = entry
+    for path, keys in manifests.items():
+        yield rollback_manifest(path, list(keys.values()), dry_run)
+
+
+def rollback_manifest(
+    path: str, entries: List[JournalEntry], dry_run: bool = False
+) -> RollbackResult:
+    """Restore old values of entries of a single manifest.
+
+    The fingerprint of the latest entry has to match the manifest.
+    """
+    latest = entries[-1]
+    try:
+        manifest = ManifestHandler(path, [entry.key for entry in entries])
+        if all(
+            manifest.get_value(entry.key).text == entry.old
+            for entry in entries
+        ):
+            return RollbackResult(path, entries, restored_before=True)
+        if manifest.fingerprint != (latest.mtime, latest.size) or any(
+            manifest.get_value(entry.key).text != entry.new
+            for entry in entries
+        ):
+            return RollbackResult(path, entries, changed=True)
+        if dry_run:
+            return RollbackResult(path, entries)
+        manifest.write_values({entry.key: entry.old for entry in entries})
+        mtime, size = manifest.fingerprint
+        edits = tuple(
+            Edit(entry.key, entry.new, entry.old, mtime, size)
+            for entry in entries
+        )
+    except ManifestFileError as exc:
+        return RollbackResult(path, entries, error=": ".join(exc.args))
+    except ManifestKeyError:
+        return RollbackResult(
+            path, entries, error="unable to parse manifest file content"
+        )
+    return RollbackResult(path, entries, restored=True, edits=edits)
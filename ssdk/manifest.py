@@ -13,74 +13,305 @@
 
 """Main functionality for Steam appmanifest.acf file interaction."""
 
-import re
+import contextlib
+import itertools
+import os
+import time
+from typing import (
+    IO,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
 
-from typing import IO, Tuple
+from . import vdf
+
+CHUNK_SIZE = 1024
+O_BINARY = getattr(os, "O_BINARY", 0)  # only defined on Windows
 
 
 class ManifestFileError(Exception):
     """Exception for errors during manifest file interaction."""
 
 
+class ManifestChangedError(ManifestFileError):
+    """Exception for manifests modified since they were read."""
+
+
 class ManifestKeyError(Exception):
     """Exception for errors during parsing manifest keys and values."""
 
 
 class ManifestHandler:
-    """Handler for interacting with appmanifest.acf files."""
+    """Handler for interacting with appmanifest.acf files.
 
-    def __init__(self, path: str) -> None:
+    The handler keeps track of the seconds spent reading, parsing and
+    writing the manifest as well as the number of bytes read and
+    written. If keys are given, the manifest is read in chunks only
+    until all of these AppState keys are found and raw_content stays
+    None. Other keys can then only be accessed if they precede the last
+    requested key. Writes only succeed if modification time and size of
+    the file still match the fingerprint taken when it was read.
+    """
+
+    def __init__(
+        self, path: str, keys: Optional[Iterable[str]] = None
+    ) -> None:
         """Initialize handler for given manifest file."""
         self.file = path
-        self.raw_content = self.get_raw_content()
+        self.keys: Optional[FrozenSet[str]] = None
+        self.raw_content: Optional[bytes] = None
+        self.fingerprint: Optional[Tuple[int, int]] = None
+        self.bytes_read = self.bytes_written = 0
+        self.read_time = self.write_time = 0.0
+        started = time.perf_counter()
+        if keys is None:
+            self.raw_content = self.get_raw_content()
+            self.read_time = time.perf_counter() - started
+            self.bytes_read = len(self.raw_content)
+            self.app_state = self.parse_app_state()
+        else:
+            self.keys = frozenset(keys) | {"AutoUpdateBehavior"}
+            self.app_state = self.scan_app_state()
         self.priority_key, self.update_priority = self.parse_update_priority()
+        self.parse_time = time.perf_counter() - started - self.read_time
 
-    def get_raw_content(self) -> str:
-        """Return string of appmanifest content without processing."""
+    def get_raw_content(self) -> bytes:
+        """Return bytes of appmanifest content without processing."""
         with self._open() as manifest:
+            self.fingerprint = self._fingerprint(manifest)
             return manifest.read()
 
-    def parse_update_priority(self) -> Tuple[re.Match, int]:
-        """Get match obj & value for manifest key AutoUpdateBehavior."""
-        search = re.search(  # Example Entry: '\t"AutoUpdateBehavior"\t\t"0"'
-            r'\t"AutoUpdateBehavior"\t\t"(\d)"', self.raw_content
-        )
-        if search is None:
-            raise ManifestKeyError("AutoUpdateBehavior")
-        return search, int(search.group(1))
+    def parse_app_state(self) -> vdf.KeyValues:
+        """Parse manifest content and return the AppState section."""
+        try:
+            app_state = vdf.parse(self.raw_content).get("AppState")
+        except vdf.VdfSyntaxError as exc:
+            raise ManifestKeyError("AppState") from exc
+        if not isinstance(app_state, dict):
+            raise ManifestKeyError("AppState")
+        return app_state
+
+    def scan_app_state(self) -> vdf.KeyValues:
+        """Parse manifest until all keys are found and return it.
+
+        The first chunk is scanned for the keys, only manifests in an
+        unusual layout are tokenized.
+        """
+        manifest = self._open_raw()
+        try:
+            self.fingerprint = self._fingerprint(manifest)
+            first = self._read_chunk(manifest)
+            scanned = vdf.scan_keys(first, "AppState", self.keys)
+            if scanned is not None:
+                return scanned
+            parser = vdf.KeyValuesParser()
+            missing = set(self.keys)
+            chunks = iter(lambda: self._read_chunk(manifest), b"")
+            tokens = vdf.iter_tokens(itertools.chain((first,), chunks))
+            try:
+                for path, key, _ in parser.iter_values(tokens):
+                    if path == ("AppState",) and key in missing:
+                        missing.discard(key)
+                        if not missing:
+                            break
+            except vdf.VdfSyntaxError as exc:
+                raise ManifestKeyError("AppState") from exc
+        finally:
+            os.close(manifest)
+        app_state = parser.root.get("AppState")
+        if not isinstance(app_state, dict):
+            raise ManifestKeyError("AppState")
+        return app_state
+
+    def get_value(self, key: str) -> vdf.Value:
+        """Return value with byte offsets for given AppState key."""
+        value = self.app_state.get(key)
+        if not isinstance(value, vdf.Value):
+            raise ManifestKeyError(key)
+        return value
+
+    def parse_update_priority(self) -> Tuple[vdf.Value, int]:
+        """Get value obj & value for manifest key AutoUpdateBehavior."""
+        value = self.get_value("AutoUpdateBehavior")
+        try:
+            return value, int(value.text)
+        except ValueError as exc:
+            raise ManifestKeyError("AutoUpdateBehavior") from exc
 
     def write_new_update_priority(self, priority: int = 2) -> None:
         """Write new value for AutoUpdateBehavior key to appmanifest."""
-        key_str = self.priority_key.group()
-        new_content = self.raw_content.replace(
-            key_str, key_str.replace(str(self.update_priority), str(priority))
-        )
-        with self._open("w") as manifest:
-            manifest.write(new_content)
+        self.write_value("AutoUpdateBehavior", str(priority))
+
+    def write_value(self, key: str, text: str) -> None:
+        """Write new value for AppState key to appmanifest."""
+        self.write_values({key: text})
+
+    def write_values(self, values: Dict[str, str]) -> None:
+        """Write new values for AppState keys with a single write.
+
+        If every new value has the same length as the old one, only
+        the bytes of the values are overwritten in place. Otherwise the
+        whole file is replaced atomically with a rewritten copy. Nothing
+        is written if the file was modified since it was read.
+        """
+        started = time.perf_counter()
+        edits = [
+            (self.get_value(key), vdf.encode(text))
+            for key, text in values.items()
+        ]
+        edits.sort(key=lambda edit: edit[0].start)
+        if all(len(raw) == value.end - value.start for value, raw in edits):
+            with self._open("r+b") as manifest:
+                self._check_fingerprint(self._fingerprint(manifest))
+                try:
+                    for value, raw in edits:
+                        manifest.seek(value.start)
+                        manifest.write(raw)
+                    manifest.flush()
+                except OSError as exc:
+                    raise ManifestFileError(
+                        "cannot write manifest file", self.file
+                    ) from exc
+                self.fingerprint = self._fingerprint(manifest)
+            if self.raw_content is not None:
+                self.raw_content = _splice(self.raw_content, edits)
+            for key, text in values.items():
+                value = self.app_state[key]
+                self.app_state[key] = vdf.Value(text, value.start, value.end)
+            self.bytes_written += sum(len(raw) for _, raw in edits)
+        else:
+            fingerprint = self.fingerprint
+            if self.raw_content is None:
+                content = self.get_raw_content()
+            else:
+                content = self.raw_content
+                with self._open() as manifest:
+                    self.fingerprint = self._fingerprint(manifest)
+            self._check_fingerprint(self.fingerprint, fingerprint)
+            new_content = _splice(content, edits)
+            self._replace(new_content)
+            if self.raw_content is None:
+                self.app_state = self.scan_app_state()
+            else:
+                self.raw_content = new_content
+                self.app_state = self.parse_app_state()
+                with self._open() as manifest:
+                    self.fingerprint = self._fingerprint(manifest)
+            self.bytes_written += len(new_content)
+        self.priority_key, self.update_priority = self.parse_update_priority()
+        self.write_time += time.perf_counter() - started
 
     @property
     def game_title(self) -> str:
         """Extract title of game from manifest contents."""
-        search = re.search(r'\t"name"\t\t"(.*)"', self.raw_content)
-        if search is None:
-            raise ManifestKeyError("name")
-        return search.group(1)
+        return self.get_value("name").text
 
-    def _open(self, filemode="r") -> IO:
-        """Open manifest file in specified mode."""
+    @property
+    def app_id(self) -> str:
+        """Extract app ID of game from manifest contents."""
+        return self.get_value("appid").text
+
+    def _check_fingerprint(
+        self,
+        current: Optional[Tuple[int, int]],
+        expected: Optional[Tuple[int, int]] = None
+    ) -> None:
+        """Raise ManifestChangedError if file changed since reading."""
+        if expected is None:
+            expected = self.fingerprint
+        if current != expected:
+            raise ManifestChangedError(
+                "manifest file changed since it was read", self.file
+            )
+
+    def _replace(self, content: bytes) -> None:
+        """Replace manifest file with new content using a temp file."""
+        replace_file(self.file, content)
+
+    def _fingerprint(self, manifest: Union[IO, int]) -> Tuple[int, int]:
+        """Return modification time and size of open manifest file."""
+        if not isinstance(manifest, int):
+            manifest = manifest.fileno()
         try:
-            return open(self.file, filemode, encoding="utf-8")
+            stat = os.fstat(manifest)
         except OSError as exc:
             raise ManifestFileError(
                 "cannot access manifest file", self.file
             ) from exc
+        return stat.st_mtime_ns, stat.st_size
+
+    def _open(self, filemode="rb") -> IO:
+        """Open manifest file in specified binary mode."""
+        try:
+            return open(self.file, filemode)
+        except OSError as exc:
+            raise ManifestFileError(
+                "cannot access manifest file", self.file
+            ) from exc
+
+    def _open_raw(self) -> int:
+        """Open manifest file for reading and return the descriptor.
+
+        Skipping the file object saves more time than the scan of the
+        first chunk takes.
+        """
+        try:
+            return os.open(self.file, os.O_RDONLY | O_BINARY)
+        except OSError as exc:
+            raise ManifestFileError(
+                "cannot access manifest file", self.file
+            ) from exc
+
+    def _read_chunk(self, manifest: int) -> bytes:
+        """Return next chunk of manifest and count bytes and time."""
+        started = time.perf_counter()
+        try:
+            chunk = os.read(manifest, CHUNK_SIZE)
+        except OSError as exc:
+            raise ManifestFileError(
+                "cannot access manifest file", self.file
+            ) from exc
+        self.read_time += time.perf_counter() - started
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def replace_file(path: str, content: bytes) -> None:
+    """Atomically replace manifest at path with new content."""
+    import shutil  # only needed when values change their length
+    import tempfile
+    manifest_dir, manifest_name = os.path.split(path)
+    try:
+        tmp_fd, tmp_file = tempfile.mkstemp(
+            suffix=".tmp", prefix=manifest_name + ".", dir=manifest_dir
+        )
+    except OSError as exc:
+        raise ManifestFileError("cannot access manifest file", path) from exc
+    try:
+        with os.fdopen(tmp_fd, "wb") as tmp_manifest:
+            tmp_manifest.write(content)
+            tmp_manifest.flush()
+            os.fsync(tmp_manifest.fileno())
+        shutil.copymode(path, tmp_file)
+        os.replace(tmp_file, path)
+    except OSError as exc:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_file)
+        raise ManifestFileError("cannot access manifest file", path) from exc
 
 
-if __name__ == '__main__':
-    test_manifest = ManifestHandler(r".test_manifests\appmanifest_261640.acf")
-    print(
-        test_manifest.game_title,
-        test_manifest.priority_key,
-        test_manifest.update_priority,
-        sep="\n", end="\n"
-    )
+def _splice(
+    content: bytes, edits: List[Tuple[vdf.Value, bytes]]
+) -> bytes:
+    """Return content with bytes of each value replaced by raw bytes."""
+    parts, pos = [], 0
+    for value, raw in edits:
+        parts += content[pos:value.start], raw
+        pos = value.end
+    parts.append(content[pos:])
+    return b"".join(parts)
@@ -0,0 +1,317 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Writers for the output of a run in different formats.
+
+Lines are collected and written to the stream in blocks, so a run over
+many manifests doesn't issue one write per manifest.
+"""
+
+import json
+import sys
+from typing import TYPE_CHECKING, Dict, List, Optional, TextIO
+
+from .core.models import SteamLibrary
+from .runner import ManifestResult
+
+if TYPE_CHECKING:
+    from .devices import DeviceQueue
+
+BUFFER_LINES = 512
+FORMATS = ("text", "jsonl")
+
+
+class ResultWriter:
+    """Buffered writer printing nothing but the summary of a run."""
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        """Initialize writer for stream (default: stdout)."""
+        self.stream = stream if stream is not None else sys.stdout
+        self.lines: List[str] = []
+        self.errors = 0
+
+    def write(self, line: str) -> None:
+        """Buffer line and write buffer to stream if it's full."""
+        self.lines.append(line)
+        if len(self.lines) >= BUFFER_LINES:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered lines to stream."""
+        if self.lines:
+            self.stream.write("\n".join(self.lines) + "\n")
+            self.lines.clear()
+        self.stream.flush()
+
+    def library(self, lib: SteamLibrary) -> None:
+        """Start output of results of a library."""
+
+    def library_error(self, lib: SteamLibrary, error: str) -> None:
+        """Report that library couldn't be processed."""
+        del lib, error
+        self.errors += 1
+
+    def result(self, result: ManifestResult) -> None:
+        """Report the result of a single manifest."""
+        if result.error is not None and not result.contended:
+            self.errors += 1
+
+    def error(self, message: str) -> None:
+        """Report error not bound to a library or manifest."""
+        del message
+        self.errors += 1
+
+    def retries(self, count: int) -> None:
+        """Start output of results of retried manifests."""
+
+    def retry_result(self, lib: SteamLibrary, result: ManifestResult) -> None:
+        """Report the final result of a retried manifest of library."""
+        del lib
+        self.result(result)
+
+    def device(self, device_queue: "DeviceQueue") -> None:
+        """Report throughput of a device queue."""
+
+    def contended(self, paths: List[str]) -> None:
+        """Report manifests that couldn't be written after retries."""
+
+    def urgent(
+        self,
+        urgent_count: int,
+        fix_count: int,
+        seconds: Optional[float] = None
+    ) -> None:
+        """Report how long it took to fix games with pending updates."""
+
+    def journal(self, run: str, change_count: int) -> None:
+        """Report run ID changes were recorded under in the journal."""
+
+    def config(
+        self, config_file: str, update_count: int, library_count: int
+    ) -> None:
+        """Report summary of a single config file of a fleet."""
+
+    def summary(self, update_count: int, library_count: int) -> None:
+        """Write summary with number of errors and flush the buffer."""
+        self.write(get_summary(update_count, library_count, self.errors))
+        self.flush()
+
+
+class TextWriter(ResultWriter):
+    """Buffered writer with a line for each library and manifest."""
+
+    def library(self, lib: SteamLibrary) -> None:
+        """Write header of library."""
+        self.write(f"=== Steam Library: {lib}")
+
+    def library_error(self, lib: SteamLibrary, error: str) -> None:
+        """Write error of library."""
+        super().library_error(lib, error)
+        self.write(f"ERROR: {error}")
+
+    def result(self, result: ManifestResult) -> None:
+        """Write outcome and title of manifest."""
+        super().result(result)
+        if result.contended:
+            self.write(f"    Deferred '{result.title}': {result.error}")
+        elif result.error is not None:
+            self.write(f"    ERROR: {result.error}")
+        elif result.updated and result.urgent:
+            self.write(f"    Updated '{result.title}' (pending update)")
+        elif result.updated:
+            self.write(f"    Updated '{result.title}'")
+        else:
+            self.write(f"    Skipped '{result.title}'")
+
+    def error(self, message: str) -> None:
+        """Write error not bound to a library or manifest."""
+        super().error(message)
+        self.write(f"ERROR: {message}")
+
+    def retries(self, count: int) -> None:
+        """Write header of retried manifests."""
+        self.write(f"=== Retrying {count} manifests in use by Steam")
+
+    def device(self, device_queue: "DeviceQueue") -> None:
+        """Write throughput of a device queue."""
+        self.write(str(device_queue))
+
+    def contended(self, paths: List[str]) -> None:
+        """Write manifests that couldn't be written after retries."""
+        if paths:
+            self.write(f"Still contended after retries: {len(paths)} files")
+            self.write("\n".join(f"    {path}" for path in paths))
+
+    def urgent(
+        self,
+        urgent_count: int,
+        fix_count: int,
+        seconds: Optional[float] = None
+    ) -> None:
+        """Write how long it took to fix games with pending updates."""
+        if urgent_count:
+            self.write(
+                f"Fixed {fix_count} of {urgent_count} games with pending"
+                f" updates within {seconds or 0.0:.2f} seconds."
+            )
+
+    def journal(self, run: str, change_count: int) -> None:
+        """Write run ID changes were recorded under in the journal."""
+        self.write(f"Recorded {change_count} changes as run '{run}'.")
+
+    def config(
+        self, config_file: str, update_count: int, library_count: int
+    ) -> None:
+        """Write summary of a single config file of a fleet."""
+        self.write(
+            f"Config '{config_file}': updated {update_count} games"
+            f" in {library_count} libraries."
+        )
+
+    def summary(self, update_count: int, library_count: int) -> None:
+        """Write summary without repeating the number of errors."""
+        self.write(get_summary(update_count, library_count))
+        self.flush()
+
+
+class JsonLinesWriter(ResultWriter):
+    """Buffered writer with a JSON object for each manifest.
+
+    Each line contains the library, path, title, update flag, error,
+    contended and urgent flag of a manifest. The last line contains the
+    summary of the run. If quiet, only the summary is written.
+    """
+
+    def __init__(
+        self, stream: Optional[TextIO] = None, quiet: bool = False
+    ) -> None:
+        """Initialize writer for stream (default: stdout)."""
+        super().__init__(stream)
+        self.quiet = quiet
+        self.current: Optional[str] = None
+
+    def library(self, lib: SteamLibrary) -> None:
+        """Remember library of the following results."""
+        self.current = lib.path
+
+    def library_error(self, lib: SteamLibrary, error: str) -> None:
+        """Write object with error of library."""
+        super().library_error(lib, error)
+        if not self.quiet:
+            self.write_object({"library": lib.path, "error": error})
+
+    def result(self, result: ManifestResult) -> None:
+        """Write object with outcome of manifest."""
+        super().result(result)
+        if self.quiet:
+            return
+        self.write_object({
+            "library": self.current,
+            "path": result.path,
+            "title": result.title,
+            "updated": result.updated,
+            "error": result.error,
+            "contended": result.contended,
+            "urgent": result.urgent,
+        })
+
+    def error(self, message: str) -> None:
+        """Write object with error not bound to library or manifest."""
+        super().error(message)
+        if not self.quiet:
+            self.write_object({"error": message})
+
+    def retry_result(self, lib: SteamLibrary, result: ManifestResult) -> None:
+        """Write object with final outcome of retried manifest."""
+        self.current = lib.path
+        self.result(result)
+
+    def device(self, device_queue: "DeviceQueue") -> None:
+        """Write object with throughput of a device queue."""
+        if not self.quiet:
+            self.write_object({"device": device_queue.to_dict()})
+
+    def contended(self, paths: List[str]) -> None:
+        """Write object listing manifests contended after retries."""
+        if paths and not self.quiet:
+            self.write_object({"contended": paths})
+
+    def urgent(
+        self,
+        urgent_count: int,
+        fix_count: int,
+        seconds: Optional[float] = None
+    ) -> None:
+        """Write object with fix time of games with pending updates."""
+        if self.quiet:
+            return
+        self.write_object({"urgent": {
+            "urgent": urgent_count,
+            "fixed": fix_count,
+            "fixed_after": seconds,
+        }})
+
+    def journal(self, run: str, change_count: int) -> None:
+        """Write object with run ID of changes recorded in journal."""
+        if not self.quiet:
+            self.write_object({
+                "journal": {"run": run, "changes": change_count}
+            })
+
+    def config(
+        self, config_file: str, update_count: int, library_count: int
+    ) -> None:
+        """Write object with summary of a config file of a fleet."""
+        if self.quiet:
+            return
+        self.write_object({"config": {
+            "file": config_file,
+            "updated": update_count,
+            "libraries": library_count,
+        }})
+
+    def summary(self, update_count: int, library_count: int) -> None:
+        """Write object with summary of run and flush the buffer."""
+        self.write_object({"summary": {
+            "updated": update_count,
+            "libraries": library_count,
+            "errors": self.errors,
+        }})
+        self.flush()
+
+    def write_object(self, obj: Dict) -> None:
+        """Buffer object as single line of JSON."""
+        self.write(json.dumps(obj, ensure_ascii=False))
+
+
+def get_writer(
+    output_format: str = "text", quiet: bool = False
+) -> ResultWriter:
+    """Return writer for output format or summary only if quiet."""
+    if output_format == "jsonl":
+        return JsonLinesWriter(quiet=quiet)
+    if quiet:
+        return ResultWriter()
+    return TextWriter()
+
+
+def get_summary(
+    update_count: int, library_count: int, error_count: int = 0
+) -> str:
+    """Return summary line of a run."""
+    summary = f"Updated {update_count} games in {library_count} libraries."
+    if error_count > 0:
+        summary += f" Found {error_count} errors."
+    if update_count > 0:
+        summary += " Restart Steam for changes to take effect."
+    return summary
@@ -0,0 +1,246 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Change plans separating the decision about writes from the writes.
+
+A plan records for each manifest that needs a new priority the byte
+offsets of the old value, the new value and a fingerprint consisting of
+modification time and size of the file. Applying the plan writes the
+new values at the recorded offsets without parsing the manifests again.
+Entries whose fingerprint or old value no longer match are skipped.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import Executor
+from itertools import chain, groupby, repeat
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union
+)
+
+from . import vdf
+from .manifest import ManifestFileError, replace_file
+from .runner import (
+    Edit,
+    ManifestResult,
+    PendingWrite,
+    Priority,
+    check_manifest
+)
+from .state import StateIndex
+
+PLAN_FILENAME = "ssdk-plan.json"
+PLAN_VERSION = 1
+
+
+class PlanFileError(Exception):
+    """Exception for errors during plan file interaction."""
+
+
+class PlanEntry(NamedTuple):
+    """Planned change of a single manifest value."""
+
+    path: str
+    title: str
+    key: str
+    old: str
+    new: str
+    start: int
+    end: int
+    mtime: int
+    size: int
+    device: int
+
+    def matches(self, stat: os.stat_result) -> bool:
+        """Return True if stat result matches planned fingerprint."""
+        return self.mtime == stat.st_mtime_ns and self.size == stat.st_size
+
+
+class ApplyResult(NamedTuple):
+    """Outcome of applying a single plan entry.
+
+    Changed is True if the manifest was modified since the plan was
+    created. Entries neither applied, changed nor failed were
+    only checked during a dry run. Edits contains the written value.
+    """
+
+    entry: PlanEntry
+    applied: bool = False
+    changed: bool = False
+    error: Optional[str] = None
+    edits: Tuple[Edit, ...] = ()
+
+
+class Plan:
+    """Handler for plan files listing changes of manifest values."""
+
+    def __init__(self, file: str) -> None:
+        """Initialize handler for given plan file."""
+        self.file = file
+        self.entries: List[PlanEntry] = []
+
+    @classmethod
+    def for_config(cls, config_file: str) -> "Plan":
+        """Return handler for the plan belonging to a config file."""
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        return cls(os.path.join(config_dir, PLAN_FILENAME))
+
+    def load(self) -> None:
+        """Load entries from plan file."""
+        try:
+            with open(self.file, "r", encoding="utf-8") as plan_file:
+                data = json.load(plan_file)
+        except OSError as exc:
+            raise PlanFileError("cannot access plan file", self.file) from exc
+        except ValueError as exc:
+            raise PlanFileError("invalid plan file", self.file) from exc
+        try:
+            if data.get("version") != PLAN_VERSION:
+                raise PlanFileError("unsupported plan version", self.file)
+            self.entries = [PlanEntry(*entry) for entry in data["entries"]]
+        except (KeyError, TypeError, AttributeError) as exc:
+            raise PlanFileError("invalid plan file", self.file) from exc
+
+    def save(self) -> None:
+        """Write plan to file replacing the previous plan atomically."""
+        data = {
+            "version": PLAN_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "entries": [list(entry) for entry in self.entries]
+        }
+        tmp_file = self.file + ".tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as plan_file:
+                json.dump(data, plan_file, separators=(",", ":"))
+            os.replace(tmp_file, self.file)
+        except OSError as exc:
+            raise PlanFileError("cannot write plan file", self.file) from exc
+
+    def batches(self) -> List[List[PlanEntry]]:
+        """Return entries grouped by device and directory."""
+        def batch_key(entry: PlanEntry):
+            return entry.device, os.path.dirname(entry.path)
+
+        entries = sorted(self.entries, key=batch_key)
+        return [list(batch) for _, batch in groupby(entries, batch_key)]
+
+
+def plan_manifest(
+    path: str, priority: Priority, index: Optional[StateIndex] = None
+) -> Union[ManifestResult, PlanEntry]:
+    """Return plan entry for manifest at path if it needs a write.
+
+    The fingerprint is taken before the manifest is read, so a manifest
+    changing in between will be skipped when applying the plan.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ManifestResult(
+            path,
+            error="cannot access manifest file: " + path,
+            error_type="OSError"
+        )
+    checked = check_manifest(path, priority, index)
+    if not isinstance(checked, PendingWrite):
+        return checked
+    manifest, old = checked.manifest, checked.manifest.priority_key
+    return PlanEntry(
+        path,
+        manifest.game_title,
+        "AutoUpdateBehavior",
+        old.text,
+        str(checked.priority),
+        old.start,
+        old.end,
+        stat.st_mtime_ns,
+        stat.st_size,
+        stat.st_dev
+    )
+
+
+def plan_manifests(
+    paths: Iterable[str],
+    priority: Priority,
+    pool: Optional[Executor] = None,
+    index: Optional[StateIndex] = None
+) -> Iterator[Union[ManifestResult, PlanEntry]]:
+    """Plan changes for all given manifests in given order."""
+    if pool is None:
+        return (plan_manifest(path, priority, index) for path in paths)
+    return pool.map(plan_manifest, paths, repeat(priority), repeat(index))
+
+
+def apply_entry(entry: PlanEntry, dry_run: bool = False) -> ApplyResult:
+    """Write new value of entry if its manifest is unchanged."""
+    try:
+        if not entry.matches(os.stat(entry.path)):
+            return ApplyResult(entry, changed=True)
+        if dry_run:
+            return ApplyResult(entry)
+        old, new = vdf.encode(entry.old), vdf.encode(entry.new)
+        if len(old) == len(new):
+            with open(entry.path, "r+b") as manifest:
+                manifest.seek(entry.start)
+                if manifest.read(len(old)) != old:
+                    return ApplyResult(entry, changed=True)
+                manifest.seek(entry.start)
+                manifest.write(new)
+        else:
+            with open(entry.path, "rb") as manifest:
+                content = manifest.read()
+            if content[entry.start:entry.end] != old:
+                return ApplyResult(entry, changed=True)
+            replace_file(
+                entry.path, content[:entry.start] + new + content[entry.end:]
+            )
+        stat = os.stat(entry.path)
+    except ManifestFileError as exc:
+        return ApplyResult(entry, error=": ".join(exc.args))
+    except OSError:
+        return ApplyResult(
+            entry, error="cannot access manifest file: " + entry.path
+        )
+    edit = Edit(
+        entry.key, entry.old, entry.new, stat.st_mtime_ns, stat.st_size
+    )
+    return ApplyResult(entry, applied=True, edits=(edit,))
+
+
+def apply_batch(
+    batch: List[PlanEntry], dry_run: bool = False
+) -> List[ApplyResult]:
+    """Apply all entries of a batch one after another."""
+    return [apply_entry(entry, dry_run) for entry in batch]
+
+
+def apply_plan(
+    plan: Plan, pool: Optional[Executor] = None, dry_run: bool = False
+) -> Iterator[ApplyResult]:
+    """Apply plan and yield results grouped by device and directory.
+
+    If a pool is given, the batches are applied concurrently.
+    """
+    batches = plan.batches()
+    if pool is None:
+        results = (apply_batch(batch, dry_run) for batch in batches)
+    else:
+        results = pool.map(apply_batch, batches, repeat(dry_run))
+    return chain.from_iterable(results)
@@ -0,0 +1,179 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Profiling of a complete run for the --profile option.
+
+The run is executed under cProfile while tracemalloc traces allocations.
+Snapshots taken at the end of each stage are compared with the one of
+the stage before, so the report lists the memory each stage allocated
+and kept together with its peak. This module is only imported if a run
+is actually profiled.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple
+
+TOP_ENTRIES = 25
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class ProfileError(Exception):
+    """Exception for errors during profile output interaction."""
+
+
+class Stage(NamedTuple):
+    """Memory snapshot taken at the end of a stage of the run."""
+
+    name: str
+    snapshot: tracemalloc.Snapshot
+    current: int
+    peak: int
+
+
+class Profiler:
+    """Profiler of a run writing its output to a directory.
+
+    The output files are named after the entry point and the start time,
+    so profiles of several runs can be kept in the same directory.
+    """
+
+    def __init__(
+        self, directory: str, prog: str, top: int = TOP_ENTRIES
+    ) -> None:
+        """Initialize profiler and start tracing allocations."""
+        self.directory = directory
+        self.name = f"{prog}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.stages: List[Stage] = []
+        tracemalloc.start()
+        self.snapshot("start")
+
+    @property
+    def stats_file(self) -> str:
+        """Return path of the pstats output."""
+        return os.path.join(self.directory, self.name + ".pstats")
+
+    @property
+    def summary_file(self) -> str:
+        """Return path of the text summary."""
+        return os.path.join(self.directory, self.name + ".txt")
+
+    def runcall(self, function: Callable, *args: Any) -> Any:
+        """Call function with args under cProfile, return its result."""
+        return self.profile.runcall(function, *args)
+
+    def snapshot(self, stage: str) -> None:
+        """Take memory snapshot at the end of stage and reset the peak.
+
+        The profiler is paused, so the snapshot doesn't show up in it.
+        """
+        self.profile.disable()
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            self.stages.append(Stage(
+                stage,
+                tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS),
+                current,
+                peak
+            ))
+            tracemalloc.reset_peak()
+        finally:
+            if len(self.stages) > 1:
+                self.profile.enable()
+
+    def staged(self, items: Iterable, stage: str) -> Iterator:
+        """Yield items and snapshot stage once the first is ready."""
+        iterator = iter(items)
+        for item in iterator:
+            self.snapshot(stage)
+            yield item
+            break
+        yield from iterator
+
+    def stop(self) -> None:
+        """Take final snapshot and stop tracing allocations."""
+        self.snapshot("finish")
+        self.profile.disable()
+        tracemalloc.stop()
+
+    def write(self) -> None:
+        """Write pstats output and text summary to the directory."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.profile.dump_stats(self.stats_file)
+            with open(self.summary_file, "w", encoding="utf-8") as file:
+                file.write(self.summary())
+        except OSError as exc:
+            raise ProfileError(
+                "cannot write profile", self.directory
+            ) from exc
+
+    def summary(self) -> str:
+        """Return top functions by cumulative time and stage memory."""
+        stream = io.StringIO()
+        stream.write(f"=== Top {self.top} functions by cumulative time\n")
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        for before, stage in zip(self.stages, self.stages[1:]):
+            stream.write(
+                f"=== Stage '{stage.name}': {format_kib(stage.current)} in use"
+                f" ({format_kib(stage.current - before.current, '+')}),"
+                f" peak {format_kib(stage.peak)}\n"
+            )
+            differences = stage.snapshot.compare_to(before.snapshot, "lineno")
+            for difference in differences[:self.top]:
+                if difference.size_diff:
+                    stream.write(f"    {difference}\n")
+        return stream.getvalue()
+
+
+def format_kib(size: int, sign: str = "-") -> str:
+    """Return size in bytes as KiB using given sign option of format."""
+    return f"{size / 1024:{sign}.1f} KiB"
+
+
+def run_profiled(
+    directory: str, prog: str, function: Callable, *args: Any
+) -> None:
+    """Call function with profiler and args and write the profile.
+
+    The profile is written even if the function exits the process.
+    Messages go to stderr, so they don't mix with the output of a run.
+    """
+    profiler = Profiler(directory, prog)
+    try:
+        profiler.runcall(function, *args, profiler)
+    finally:
+        profiler.stop()
+        try:
+            profiler.write()
+        except ProfileError as exc:
+            print("ERROR:", ": ".join(exc.args), file=sys.stderr)
+        else:
+            print(
+                f"Profile written to '{profiler.stats_file}'.",
+                file=sys.stderr
+            )
@@ -0,0 +1,125 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Deferred retries of manifests Steam kept from being written.
+
+A manifest whose write failed because it was in use or modified since
+it was read is put into the queue instead of being reported as failed.
+Manifests already due are retried between libraries and the rest once
+all other manifests were processed. Each retry reads the manifest again
+and waits twice as long as the one before, so Steam has time to finish
+its own write.
+"""
+
+import heapq
+import time
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from .core.models import SteamLibrary
+from .runner import ManifestResult, Priority, update_manifest
+from .state import StateIndex
+
+BASE_DELAY = 0.25
+MAX_RETRIES = 4
+
+
+class DeferredManifest(NamedTuple):
+    """Manifest waiting in the retry queue until it is due."""
+
+    due: float
+    order: int
+    path: str
+    library: SteamLibrary
+    attempt: int
+    result: ManifestResult
+
+
+class RetryQueue:
+    """Queue retrying contended manifests with exponential backoff.
+
+    Paths of manifests still contended after the last retry are kept in
+    contended for the final report of a run.
+    """
+
+    def __init__(
+        self,
+        priority: Priority,
+        retries: int = MAX_RETRIES,
+        base_delay: float = BASE_DELAY,
+        index: Optional[StateIndex] = None
+    ) -> None:
+        """Initialize empty queue for manifests with given priority."""
+        self.priority = priority
+        self.retries = retries
+        self.base_delay = base_delay
+        self.index = index
+        self.pending: List[DeferredManifest] = []
+        self.contended: List[str] = []
+        self.order = 0
+
+    def __len__(self) -> int:
+        """Return number of manifests waiting for a retry."""
+        return len(self.pending)
+
+    def defer(
+        self,
+        result: ManifestResult,
+        library: SteamLibrary,
+        attempt: int = 0
+    ) -> None:
+        """Queue manifest of contended result for a later retry."""
+        delay = self.base_delay * 2 ** attempt
+        heapq.heappush(self.pending, DeferredManifest(
+            time.monotonic() + delay,
+            self.order,
+            result.path,
+            library,
+            attempt,
+            result
+        ))
+        self.order += 1
+
+    def due(self) -> int:
+        """Return number of manifests due for a retry right now."""
+        now = time.monotonic()
+        return sum(deferred.due <= now for deferred in self.pending)
+
+    def run(
+        self, wait: bool = True
+    ) -> Iterator[Tuple[SteamLibrary, ManifestResult]]:
+        """Retry queued manifests and yield library and final result.
+
+        Manifests are retried in the order they become due, sleeping
+        only until the next one is due. Unless wait, only manifests
+        already due are retried. A manifest still contended after all
+        retries is yielded as failed.
+        """
+        started = time.monotonic()
+        while self.pending:
+            if not wait and self.pending[0].due > started:
+                return
+            deferred = heapq.heappop(self.pending)
+            if deferred.attempt >= self.retries:
+                self.contended.append(deferred.path)
+                yield deferred.library, deferred.result._replace(
+                    contended=False
+                )
+                continue
+            time.sleep(max(deferred.due - time.monotonic(), 0))
+            result = update_manifest(deferred.path, self.priority, self.index)
+            if result.contended:
+                self.defer(result, deferred.library, deferred.attempt + 1)
+                continue
+            if self.index is not None and result.state is not None:
+                self.index.entries[result.path] = result.state
+            yield deferred.library, result
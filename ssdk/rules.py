@@ -0,0 +1,172 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+r"""Rules assigning update priorities to individual games.
+
+Each line of a rules file contains a priority followed by a matcher:
+
+    2 appid:570
+    1 name:*Demo*
+    1 regex:^Half-Life
+    0 library:D:\SteamLibrary\steamapps
+
+Matchers compare the app ID, the game title with a glob pattern or a
+regular expression or the Steam Library Folder of a manifest. The first
+matching rule wins, games without a matching rule get the default.
+App IDs, libraries and titles without wildcards are compiled into dicts
+and all other title patterns into one combined regular expression, so
+evaluating a manifest needs three dict lookups and a single regex match.
+Regular expressions with groups or inline flags would change meaning
+once combined and are matched on their own instead.
+"""
+
+import fnmatch
+import functools
+import os
+import re
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Tuple
+)
+
+from .core.utils import get_abspath
+
+RULE_KINDS = ("appid", "name", "regex", "library")
+WILDCARDS = frozenset("*?[")
+
+
+class RulesFileError(Exception):
+    """Exception for errors during rules file interaction."""
+
+
+class Rule(NamedTuple):
+    """Single rule of a rules file."""
+
+    priority: int
+    kind: str
+    value: str
+
+
+class PriorityRules:
+    """Compiled rules returning the target priority for a manifest."""
+
+    def __init__(self, rules: List[Rule], default: int) -> None:
+        """Compile given rules in order of precedence."""
+        self.rules = rules
+        self.default = default
+        self.appids: Dict[str, int] = {}
+        self.libraries: Dict[str, int] = {}
+        self.names: Dict[str, int] = {}
+        self.separate: List[Tuple[int, Pattern]] = []
+        patterns = []
+        for order, rule in enumerate(rules):
+            if rule.kind == "appid":
+                self.appids.setdefault(rule.value, order)
+            elif rule.kind == "library":
+                self.libraries.setdefault(_library_key(rule.value), order)
+            elif rule.kind == "name" and not WILDCARDS & set(rule.value):
+                self.names.setdefault(rule.value, order)
+            elif rule.kind == "name":
+                pattern = fnmatch.translate(rule.value)
+                patterns.append(f"(?P<r{order}>{pattern})")
+            elif _is_combinable(rule.value):
+                patterns.append(f"(?P<r{order}>.*?(?:{rule.value}))")
+            else:
+                self.separate.append(
+                    (order, re.compile(rule.value, re.DOTALL))
+                )
+        self.titles: Optional[Pattern] = None
+        if patterns:
+            self.titles = re.compile("|".join(patterns), re.DOTALL)
+
+    @classmethod
+    def from_file(
+        cls, file: str, default: int, allowed: Iterable[str]
+    ) -> "PriorityRules":
+        """Read rules file with priorities limited to allowed values."""
+        allowed = set(allowed)
+        rules = []
+        try:
+            with open(file, "r", encoding="utf-8") as rules_file:
+                lines = rules_file.readlines()
+        except OSError as exc:
+            raise RulesFileError("cannot access rules file", file) from exc
+        for lineno, line in enumerate(lines, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            priority, *matcher = line.split(None, 1)
+            kind, _, value = "".join(matcher).strip().partition(":")
+            if (
+                priority not in allowed
+                or kind not in RULE_KINDS
+                or not value
+                or kind == "regex" and not _is_valid_regex(value)
+            ):
+                raise RulesFileError(f"invalid rule in line {lineno}", file)
+            rules.append(Rule(int(priority), kind, value))
+        try:
+            return cls(rules, default)
+        except re.error as exc:
+            raise RulesFileError("cannot combine rule patterns", file) from exc
+
+    def get_priority(self, appid: str, title: str, path: str) -> int:
+        """Return priority for manifest at path with appid and title."""
+        candidates = []
+        if (order := self.appids.get(appid)) is not None:
+            candidates.append(order)
+        if (order := self.names.get(title)) is not None:
+            candidates.append(order)
+        if self.libraries:
+            library = _library_key(os.path.dirname(path))
+            if (order := self.libraries.get(library)) is not None:
+                candidates.append(order)
+        if self.titles is not None:
+            if (match := self.titles.match(title)) is not None:
+                candidates.append(int(match.lastgroup[1:]))
+        for order, pattern in self.separate:
+            if pattern.search(title) is not None:
+                candidates.append(order)
+                break
+        if not candidates:
+            return self.default
+        return self.rules[min(candidates)].priority
+
+
+def _is_valid_regex(pattern: str) -> bool:
+    """Return True if pattern is a valid regular expression."""
+    try:
+        re.compile(pattern)
+    except re.error:
+        return False
+    return True
+
+
+def _is_combinable(pattern: str) -> bool:
+    """Return True if pattern can be part of the combined expression.
+
+    Group references would point to other groups and inline flags
+    would apply to all patterns once combined.
+    """
+    compiled = re.compile(pattern)
+    return not compiled.groups and not compiled.flags & ~re.UNICODE
+
+
+@functools.lru_cache(maxsize=None)
+def _library_key(path: str) -> str:
+    """Return normalized library path used for comparisons."""
+    return os.path.normcase(get_abspath(path))
@@ -0,0 +1,309 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Processing of appmanifest files found in Steam Libraries."""
+
+import os
+import time
+from itertools import repeat
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union
+)
+
+from .manifest import ManifestFileError, ManifestHandler, ManifestKeyError
+from .rules import PriorityRules
+from .state import ManifestState, StateIndex
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+Priority = Union[int, PriorityRules]
+MANIFEST_KEYS = ("appid", "name")
+
+
+class Edit(NamedTuple):
+    """Value written to manifest with the fingerprint after writing."""
+
+    key: str
+    old: str
+    new: str
+    mtime: int
+    size: int
+
+
+class ManifestResult(NamedTuple):
+    """Outcome of processing a single appmanifest file.
+
+    Times contains the seconds spent reading, parsing and writing the
+    manifest, duration the total seconds spent processing it. Changed
+    lists the keys that were or, if not updated, would be changed.
+    Contended is True if the write failed because the manifest was in
+    use or modified since it was read, so it is worth retrying. Edits
+    lists each value that was written. Urgent is True if the game had a
+    running or pending update when the manifest was written.
+    """
+
+    path: str
+    updated: bool = False
+    title: Optional[str] = None
+    error: Optional[str] = None
+    state: Optional[ManifestState] = None
+    error_type: Optional[str] = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    times: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    duration: float = 0.0
+    changed: Tuple[str, ...] = ()
+    contended: bool = False
+    edits: Tuple[Edit, ...] = ()
+    urgent: bool = False
+
+
+class PendingWrite(NamedTuple):
+    """Manifest read by check_manifest that needs a new priority."""
+
+    manifest: ManifestHandler
+    stat: Optional[os.stat_result]
+    started: float
+    priority: int
+
+
+def check_manifest(
+    path: str,
+    priority: Priority,
+    index: Optional[StateIndex] = None,
+    keys: Iterable[str] = MANIFEST_KEYS
+) -> Union[ManifestResult, PendingWrite]:
+    """Read manifest at path and return result if no write is needed.
+
+    The priority is either a single value for all manifests or rules
+    returning the value for each manifest. If an index is given,
+    manifests whose recorded state matches their current stat result
+    and target priority are skipped without being read. The result then
+    contains the state to be recorded for path. Keys are the AppState
+    keys read besides the update priority.
+    """
+    started = time.perf_counter()
+    try:
+        stat = None
+        if index is not None:
+            stat = _stat(path)
+            known = index.lookup(path, stat)
+            if known is not None and known.priority == get_target_priority(
+                priority, known.appid, known.title, path
+            ):
+                result = ManifestResult(path, False, known.title, state=known)
+                return _finish(result, started)
+        manifest = ManifestHandler(path, keys)
+        target = priority
+        if isinstance(priority, PriorityRules):
+            target = get_target_priority(
+                priority, manifest.app_id, manifest.game_title, path
+            )
+        if manifest.update_priority != target:
+            return PendingWrite(manifest, stat, started, target)
+        return _finish(_manifest_result(manifest, False, stat), started)
+    except (ManifestFileError, ManifestKeyError, OSError) as exc:
+        return _finish(_error_result(path, exc), started)
+
+
+def write_manifest(pending: PendingWrite) -> ManifestResult:
+    """Write target priority to manifest read by check_manifest.
+
+    A manifest that can't be written is reported as contended.
+    """
+    manifest, stat = pending.manifest, pending.stat
+    try:
+        old = manifest.priority_key.text
+        manifest.write_new_update_priority(pending.priority)
+        if stat is not None:
+            stat = _stat(manifest.file)
+        result = _manifest_result(manifest, True, stat)._replace(
+            edits=_edits(manifest, {"AutoUpdateBehavior": old})
+        )
+    except ManifestFileError as exc:
+        result = _error_result(manifest.file, exc)._replace(
+            title=manifest.game_title, contended=True
+        )
+    except (ManifestKeyError, OSError) as exc:
+        result = _error_result(manifest.file, exc)
+    return _finish(result, pending.started)
+
+
+def update_manifest(
+    path: str, priority: Priority, index: Optional[StateIndex] = None
+) -> ManifestResult:
+    """Set AutoUpdateBehavior of manifest at path to given priority."""
+    checked = check_manifest(path, priority, index)
+    if isinstance(checked, PendingWrite):
+        return write_manifest(checked)
+    return checked
+
+
+def update_manifests(
+    paths: Iterable[str],
+    priority: Priority,
+    pool: Optional["Executor"] = None,
+    index: Optional[StateIndex] = None
+) -> Iterator[ManifestResult]:
+    """Update all given manifests and yield results in given order.
+
+    If a pool is given, all manifests are submitted to it immediately
+    and processed concurrently. Results are still yielded in order.
+    """
+    if pool is None:
+        return (update_manifest(path, priority, index) for path in paths)
+    return pool.map(update_manifest, paths, repeat(priority), repeat(index))
+
+
+def edit_manifest(
+    path: str, values: Dict[str, str], dry_run: bool = False
+) -> ManifestResult:
+    """Set AppState keys of manifest at path to given values.
+
+    All changed keys are written at once. With dry_run, the result only
+    lists the keys that would be changed.
+    """
+    started = time.perf_counter()
+    try:
+        manifest = ManifestHandler(path, MANIFEST_KEYS + tuple(values))
+        old = {key: manifest.get_value(key).text for key in values}
+        changed = {
+            key: text for key, text in values.items() if old[key] != text
+        }
+        edits: Tuple[Edit, ...] = ()
+        if changed and not dry_run:
+            manifest.write_values(changed)
+            edits = _edits(manifest, {key: old[key] for key in changed})
+        result = _manifest_result(manifest, bool(edits))._replace(
+            changed=tuple(changed), edits=edits
+        )
+    except ManifestKeyError as exc:
+        if exc.args[0] not in values:
+            result = _error_result(path, exc)
+        else:
+            result = ManifestResult(
+                path,
+                error=f"key '{exc.args[0]}' not found in manifest file",
+                error_type=type(exc).__name__
+            )
+    except (ManifestFileError, OSError) as exc:
+        result = _error_result(path, exc)
+    return _finish(result, started)
+
+
+def edit_manifests(
+    paths: Iterable[str],
+    values: Dict[str, str],
+    pool: Optional["Executor"] = None,
+    dry_run: bool = False
+) -> Iterator[ManifestResult]:
+    """Edit all given manifests and yield results in given order."""
+    if pool is None:
+        return (edit_manifest(path, values, dry_run) for path in paths)
+    return pool.map(edit_manifest, paths, repeat(values), repeat(dry_run))
+
+
+def get_target_priority(
+    priority: Priority, appid: str, title: str, path: str
+) -> int:
+    """Return priority the manifest at path should have by rules."""
+    if isinstance(priority, PriorityRules):
+        return priority.get_priority(appid, title, path)
+    return priority
+
+
+def verify_state(path: str, state: ManifestState) -> bool:
+    """Return True if recorded state still describes the manifest."""
+    try:
+        if not state.matches(_stat(path)):
+            return True  # outdated entries are rescanned on next run
+        manifest = ManifestHandler(path, MANIFEST_KEYS)
+        return (
+            manifest.update_priority == state.priority
+            and manifest.game_title == state.title
+        )
+    except (ManifestFileError, ManifestKeyError):
+        return False
+
+
+def _manifest_result(
+    manifest: ManifestHandler,
+    updated: bool,
+    stat: Optional[os.stat_result] = None
+) -> ManifestResult:
+    """Return result for manifest and its state from stat or read."""
+    state = None
+    fingerprint = manifest.fingerprint
+    if stat is not None:
+        fingerprint = stat.st_mtime_ns, stat.st_size
+    if fingerprint is not None:
+        state = ManifestState(
+            *fingerprint,
+            manifest.update_priority,
+            manifest.game_title,
+            manifest.app_id
+        )
+    return ManifestResult(
+        manifest.file,
+        updated,
+        manifest.game_title,
+        state=state,
+        bytes_read=manifest.bytes_read,
+        bytes_written=manifest.bytes_written,
+        times=(manifest.read_time, manifest.parse_time, manifest.write_time)
+    )
+
+
+def _edits(
+    manifest: ManifestHandler, old: Dict[str, str]
+) -> Tuple[Edit, ...]:
+    """Return edits of written manifest from old values of keys."""
+    mtime, size = manifest.fingerprint
+    return tuple(
+        Edit(key, text, manifest.get_value(key).text, mtime, size)
+        for key, text in old.items()
+    )
+
+
+def _error_result(path: str, exc: Exception) -> ManifestResult:
+    """Return result for manifest that failed with given exception."""
+    if isinstance(exc, ManifestFileError):
+        error = ": ".join(exc.args)
+    elif isinstance(exc, ManifestKeyError):
+        error = "unable to parse manifest file content"
+    else:
+        error = "cannot access manifest file: " + path
+    return ManifestResult(path, error=error, error_type=type(exc).__name__)
+
+
+def _finish(result: ManifestResult, started: float) -> ManifestResult:
+    """Return result with duration since started."""
+    return result._replace(duration=time.perf_counter() - started)
+
+
+def _stat(path: str) -> os.stat_result:
+    """Return stat result for manifest at path."""
+    try:
+        return os.stat(path)
+    except OSError as exc:
+        raise ManifestFileError(
+            "cannot access manifest file", path
+        ) from exc
@@ -0,0 +1,115 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Persistent index of manifest states for incremental runs."""
+
+import json
+import os
+from typing import Dict, Iterable, NamedTuple, Optional
+
+STATE_FILENAME = "ssdk-state.json"
+STATE_VERSION = 2
+
+
+class StateIndexError(Exception):
+    """Exception for errors during state index file interaction."""
+
+
+class ManifestState(NamedTuple):
+    """Last known state of a single appmanifest file."""
+
+    mtime: int
+    size: int
+    priority: int
+    title: str
+    appid: str
+
+    def matches(self, stat: os.stat_result) -> bool:
+        """Return True if stat result matches the recorded state."""
+        return self.mtime == stat.st_mtime_ns and self.size == stat.st_size
+
+
+class StateIndex:
+    """Handler for the index file next to a config file.
+
+    The index maps each manifest path to the modification time, size,
+    update priority, game title and app ID seen during the last run.
+    Manifests with a matching stat result don't need to be read again.
+    """
+
+    def __init__(self, file: str) -> None:
+        """Initialize handler for given index file."""
+        self.file = file
+        self.entries: Dict[str, ManifestState] = {}
+
+    @classmethod
+    def for_config(cls, config_file: str) -> "StateIndex":
+        """Return handler for the index belonging to a config file."""
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        return cls(os.path.join(config_dir, STATE_FILENAME))
+
+    def load(self) -> bool:
+        """Load index file and return True if it held a valid index.
+
+        A missing, unreadable or outdated index file results in an empty
+        index, which causes a full rescan of all manifests.
+        """
+        self.entries = {}
+        try:
+            with open(self.file, "r", encoding="utf-8") as index_file:
+                data = json.load(index_file)
+            if data.get("version") != STATE_VERSION:
+                return False
+            self.entries = {
+                path: ManifestState(*entry)
+                for path, entry in data["manifests"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.entries = {}
+            return False
+        return True
+
+    def save(self) -> None:
+        """Write index to file, replacing the old index atomically."""
+        data = {
+            "version": STATE_VERSION,
+            "manifests": {
+                path: list(state) for path, state in self.entries.items()
+            }
+        }
+        tmp_file = self.file + ".tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as index_file:
+                json.dump(data, index_file, separators=(",", ":"))
+            os.replace(tmp_file, self.file)
+        except OSError as exc:
+            raise StateIndexError(
+                "cannot write state index", self.file
+            ) from exc
+
+    def lookup(
+        self, path: str, stat: os.stat_result
+    ) -> Optional[ManifestState]:
+        """Return recorded state for path if it matches stat result."""
+        state = self.entries.get(path)
+        if state is not None and state.matches(stat):
+            return state
+        return None
+
+    def retain(self, paths: Iterable[str]) -> None:
+        """Remove all entries whose path is not in given paths."""
+        keep = set(paths)
+        self.entries = {
+            path: state for path, state in self.entries.items()
+            if path in keep
+        }
@@ -0,0 +1,192 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Collection of timings and counters for JSON run reports."""
+
+import contextlib
+import heapq
+import json
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .runner import ManifestResult
+
+COUNTERS = (
+    "listed",
+    "bytes_read",
+    "bytes_written",
+    "skipped",
+    "updated",
+    "deferred",
+    "errors"
+)
+MANIFEST_PHASES = ("read", "parse", "write")
+
+
+class StatsFileError(Exception):
+    """Exception for errors during stats report file interaction."""
+
+
+class PhaseStats:
+    """Wall time per phase together with counters and error classes."""
+
+    def __init__(self) -> None:
+        """Initialize empty phases and counters."""
+        self.phases: Dict[str, float] = {}
+        self.counts: Counter = Counter({name: 0 for name in COUNTERS})
+        self.errors: Counter = Counter()
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """Add seconds to the wall time of given phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_error(self, error_type: str) -> None:
+        """Count an error of given exception class name."""
+        self.counts["errors"] += 1
+        self.errors[error_type] += 1
+
+    def to_dict(self) -> Dict:
+        """Return phases and counters as dict for the JSON report."""
+        return {
+            "phases": dict(self.phases),
+            "counts": dict(self.counts),
+            "errors": dict(self.errors),
+        }
+
+
+class RunStats(PhaseStats):
+    """Statistics of a run with separate statistics for each library.
+
+    Phases not belonging to a library are only recorded for the run,
+    the phases of a library are added to the totals of the run as well.
+    If slowest is greater than zero, the slowest manifests are kept.
+    Devices holds the throughput of each device queue if one was used,
+    urgent the number and fix time of games with pending updates.
+    """
+
+    def __init__(self, command: str, slowest: int = 0) -> None:
+        """Initialize statistics for a run of given entry point."""
+        super().__init__()
+        self.command = command
+        self.slowest = slowest
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.libraries: Dict[str, PhaseStats] = {}
+        self.files: List[Tuple[float, str]] = []
+        self.devices: List[Dict] = []
+        self.urgent: Dict = {}
+
+    def library(self, path: str) -> PhaseStats:
+        """Return statistics of library at path."""
+        if path not in self.libraries:
+            self.libraries[path] = PhaseStats()
+        return self.libraries[path]
+
+    @contextlib.contextmanager
+    def phase(self, name: str, library: Optional[str] = None) -> Iterator:
+        """Add wall time of the context to phase of run and library."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started, library)
+
+    def add_phase(
+        self, name: str, seconds: float, library: Optional[str] = None
+    ) -> None:
+        """Add seconds timed elsewhere to phase of run and library."""
+        self.add_time(name, seconds)
+        if library is not None:
+            self.library(library).add_time(name, seconds)
+
+    def add_count(self, name: str, count: int, library: str) -> None:
+        """Add count to counter of run and library."""
+        self.counts[name] += count
+        self.library(library).counts[name] += count
+
+    def add_library_error(self, error_type: str, library: str) -> None:
+        """Count an error that occurred for the library as a whole."""
+        self.add_error(error_type)
+        self.library(library).add_error(error_type)
+
+    def add_result(self, result: ManifestResult, library: str) -> None:
+        """Add counters and timings of a processed manifest."""
+        for stats in (self, self.library(library)):
+            if result.contended:
+                stats.counts["deferred"] += 1
+            elif result.error_type is not None:
+                stats.add_error(result.error_type)
+            elif result.updated:
+                stats.counts["updated"] += 1
+            else:
+                stats.counts["skipped"] += 1
+            stats.counts["bytes_read"] += result.bytes_read
+            stats.counts["bytes_written"] += result.bytes_written
+            for name, seconds in zip(MANIFEST_PHASES, result.times):
+                if seconds:
+                    stats.add_time(name, seconds)
+        if self.slowest > 0:
+            item = result.duration, result.path
+            if len(self.files) < self.slowest:
+                heapq.heappush(self.files, item)
+            else:
+                heapq.heappushpop(self.files, item)
+
+    def to_dict(self) -> Dict:
+        """Return complete report as dict."""
+        report = {
+            "command": self.command,
+            "started": time.strftime(
+                "%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)
+            ),
+            "duration": time.perf_counter() - self.clock,
+        }
+        report.update(super().to_dict())
+        report["libraries"] = [
+            dict(path=path, **stats.to_dict())
+            for path, stats in self.libraries.items()
+        ]
+        if self.devices:
+            report["devices"] = self.devices
+        if self.urgent:
+            report["urgent"] = self.urgent
+        if self.slowest > 0:
+            report["slowest"] = [
+                {"path": path, "duration": duration}
+                for duration, path in sorted(self.files, reverse=True)
+            ]
+        return report
+
+    def write(self, file: str) -> None:
+        """Write report as JSON to file or to stdout if file is '-'.
+
+        On stdout the report is a single line, so it can follow the
+        objects of the jsonl output format.
+        """
+        if file == "-":
+            print(json.dumps(self.to_dict()))
+            return
+        try:
+            with open(file, "w", encoding="utf-8") as stats_file:
+                json.dump(self.to_dict(), stats_file, indent=2)
+        except OSError as exc:
+            raise StatsFileError("cannot write stats report", file) from exc
+
+
+def write_stats(stats: RunStats, file: str) -> None:
+    """Write stats report and print error if it cannot be written."""
+    try:
+        stats.write(file)
+    except StatsFileError as exc:
+        print("ERROR:", ": ".join(exc.args))
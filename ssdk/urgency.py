@@ -0,0 +1,237 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Ordering of manifest writes by the urgency of pending updates.
+
+Manifests are read together with the AppState keys telling whether
+Steam is about to download an update. Manifests of games with a running
+or pending update that need a new priority are written as soon as they
+are read, so they are fixed while the others are still being read. All
+other manifests that need a new priority are put into a heap and
+written in order of urgency once all manifests were read.
+"""
+
+import heapq
+import time
+from itertools import repeat
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple
+)
+
+from .core.models import SteamLibrary
+from .manifest import ManifestKeyError
+from .runner import (
+    MANIFEST_KEYS,
+    ManifestResult,
+    PendingWrite,
+    Priority,
+    check_manifest,
+    write_manifest
+)
+from .state import StateIndex
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+URGENCY_KEYS = MANIFEST_KEYS + (
+    "StateFlags",
+    "LastUpdated",
+    "UpdateResult",
+    "BytesToDownload",
+    "BytesDownloaded"
+)
+
+UPDATE_REQUIRED = 0x2
+UPDATE_ACTIVE = (
+    0x100  # update running
+    | 0x200  # update paused
+    | 0x400  # update started
+    | 0x80000  # preallocating
+    | 0x100000  # downloading
+    | 0x200000  # staging
+    | 0x400000  # committing
+)
+
+RUNNING, PENDING, IDLE = range(3)
+
+LibraryResults = Tuple[SteamLibrary, Optional[List[ManifestResult]]]
+Urgency = Tuple[int, int, int]
+
+
+class UrgentWrite(NamedTuple):
+    """Manifest waiting in the heap for its new priority."""
+
+    urgency: Urgency
+    order: int
+    library: int
+    position: int
+    pending: PendingWrite
+
+
+class UrgencyQueue:
+    """Queue writing manifests of games with pending updates first.
+
+    After a run, urgent holds the number of manifests with a running or
+    pending update, fixed the number of them updated and fixed_after
+    the seconds from the start of the run until the last was written.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty queue."""
+        self.pending: List[UrgentWrite] = []
+        self.order = 0
+        self.urgent = self.fixed = 0
+        self.fixed_after: Optional[float] = None
+
+    def __len__(self) -> int:
+        """Return number of manifests waiting to be written."""
+        return len(self.pending)
+
+    def update_libraries(
+        self,
+        libraries: Iterable[SteamLibrary],
+        priority: Priority,
+        pool: Optional["Executor"] = None,
+        index: Optional[StateIndex] = None
+    ) -> List[LibraryResults]:
+        """Update all libraries and return results of each in order.
+
+        Results are None if a library is unlistable. Manifests are read
+        concurrently if a pool is given. Manifests of games with a
+        running or pending update are written as soon as they are read,
+        all others once all manifests were read in order of urgency.
+        """
+        started = time.perf_counter()
+        listed: List[LibraryResults] = []
+        for lib in libraries:
+            try:
+                listed.append((lib, lib.get_appmanifest_list()))
+            except OSError:
+                listed.append((lib, None))
+        located = [
+            (library, position, path)
+            for library, (_, manifests) in enumerate(listed)
+            for position, path in enumerate(manifests or ())
+        ]
+        args = (
+            [path for _, _, path in located],
+            repeat(priority),
+            repeat(index),
+            repeat(URGENCY_KEYS)
+        )
+        checked = (
+            pool.map(check_manifest, *args) if pool is not None
+            else map(check_manifest, *args)
+        )
+        results: List[List[Optional[ManifestResult]]] = [
+            [None] * len(manifests or ()) for _, manifests in listed
+        ]
+        for (library, position, _), result in zip(located, checked):
+            if isinstance(result, PendingWrite):
+                write = self.push(result, library, position)
+                if write is None:
+                    continue
+                result = self.finish(write, write_manifest(result))
+                if result.updated:
+                    self.fixed_after = time.perf_counter() - started
+            results[library][position] = result
+        for write, result in self.write(pool):
+            results[write.library][write.position] = result
+        return [
+            (lib, results[library] if manifests is not None else None)
+            for library, (lib, manifests) in enumerate(listed)
+        ]
+
+    def push(
+        self, pending: PendingWrite, library: int, position: int
+    ) -> Optional[UrgentWrite]:
+        """Queue write of manifest at position of library unless urgent.
+
+        Writes of games with a running or pending update are returned
+        instead, so they can be written right away.
+        """
+        write = UrgentWrite(
+            get_urgency(pending), self.order, library, position, pending
+        )
+        self.order += 1
+        if write.urgency[0] != IDLE:
+            self.urgent += 1
+            return write
+        heapq.heappush(self.pending, write)
+        return None
+
+    def finish(
+        self, write: UrgentWrite, result: ManifestResult
+    ) -> ManifestResult:
+        """Return result of write marked as urgent if it was urgent."""
+        if write.urgency[0] == IDLE:
+            return result
+        self.fixed += result.updated
+        return result._replace(urgent=True)
+
+    def write(
+        self, pool: Optional["Executor"] = None
+    ) -> Iterator[Tuple[UrgentWrite, ManifestResult]]:
+        """Write queued manifests and yield them with their results."""
+        writes = [heapq.heappop(self.pending) for _ in range(len(self))]
+        pending = [write.pending for write in writes]
+        results = (
+            pool.map(write_manifest, pending) if pool is not None
+            else map(write_manifest, pending)
+        )
+        for write, result in zip(writes, results):
+            yield write, self.finish(write, result)
+
+    def to_dict(self) -> Dict:
+        """Return number and fix time of urgent manifests for report."""
+        return {
+            "urgent": self.urgent,
+            "fixed": self.fixed,
+            "fixed_after": self.fixed_after,
+        }
+
+
+def get_urgency(pending: PendingWrite) -> Urgency:
+    """Return sort key of manifest, most urgent first.
+
+    Updates Steam is running come before pending updates, larger
+    downloads before smaller ones and older updates before newer ones.
+    """
+    values = {
+        key: _get_int(pending, key)
+        for key in URGENCY_KEYS[len(MANIFEST_KEYS):]
+    }
+    flags = values["StateFlags"]
+    remaining = max(values["BytesToDownload"] - values["BytesDownloaded"], 0)
+    if flags & UPDATE_ACTIVE:
+        level = RUNNING
+    elif flags & UPDATE_REQUIRED or remaining or values["UpdateResult"]:
+        level = PENDING
+    else:
+        level = IDLE
+    return level, -remaining, values["LastUpdated"]
+
+
+def _get_int(pending: PendingWrite, key: str) -> int:
+    """Return integer value of key or 0 if it's missing or invalid."""
+    try:
+        return int(pending.manifest.get_value(key).text)
+    except (ManifestKeyError, ValueError):
+        return 0
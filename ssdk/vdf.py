@@ -0,0 +1,271 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Incremental parser for Valve KeyValues files like appmanifests.
+
+The parser works on bytes and records the byte offsets of every value,
+so a single value can be patched in the file without parsing it again.
+Data may be fed in chunks of any size, a token that is cut off at the
+end of a chunk is completed with the next chunk. Values at the top of
+a section in the usual layout of appmanifests are found by a faster
+scan with one precompiled pattern instead.
+"""
+
+import functools
+import re
+from typing import (
+    BinaryIO, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple,
+    Optional, Pattern, Tuple, Union
+)
+
+TOKEN_PATTERN = re.compile(rb"""
+    (  # skipped text, can't be shortened to let a token match instead
+        (?:[ \t\r\n\f\v]+|//[^\n]*(?:\n|\Z)|\[[^\]\n]*\])*
+    )
+    (?:
+        ("[^"\\]*(?:\\.[^"\\]*)*")  # quoted string
+        | (\{)
+        | (\})
+        | ([^ \t\r\n\f\v"{}\[\]/][^ \t\r\n\f\v"{}\[\]]*)  # unquoted string
+        | \Z
+    )
+""", re.VERBOSE | re.DOTALL)
+ESCAPE_PATTERN = re.compile(rb"\\(.)", re.DOTALL)
+ESCAPES = {b"n": b"\n", b"t": b"\t"}
+
+STRING, OPEN, CLOSE = range(3)
+GROUP_KINDS = (None, None, STRING, OPEN, CLOSE, STRING)
+Token = Tuple[int, bytes, int, int]
+KeyPath = Tuple[str, ...]
+
+
+class VdfSyntaxError(ValueError):
+    """Exception for data that isn't valid KeyValues syntax."""
+
+
+class Value(NamedTuple):
+    """Value of a key with the byte offsets of its raw text."""
+
+    text: str
+    start: int
+    end: int
+
+
+KeyValues = Dict[str, Union[Value, "KeyValues"]]
+_new_value = tuple.__new__  # skips the argument handling of Value.__new__
+
+
+def iter_tokens(chunks: Iterable[bytes]) -> Iterator[Token]:
+    """Yield kind, raw text, start and end offset for each token.
+
+    Whitespace, comments and conditions are skipped. Offsets of quoted
+    strings point to the text between the quotes. Unquoted strings have
+    the kind STRING as well.
+    """
+    buffer, base = b"", 0
+    for chunk in chunks:
+        buffer += chunk
+        pos = yield from _match_tokens(buffer, base, final=False)
+        buffer, base = buffer[pos:], base + pos
+    yield from tokenize(buffer, base)
+
+
+def tokenize(data: bytes, base: int = 0) -> Iterator[Token]:
+    """Yield tokens like iter_tokens for complete data in one chunk."""
+    pos = yield from _match_tokens(data, base, final=True)
+    if pos < len(data):
+        raise VdfSyntaxError("unexpected data", base + pos)
+
+
+class KeyValuesParser:
+    """Parser building a tree of nested dicts from KeyValues data."""
+
+    def __init__(self) -> None:
+        """Initialize parser with an empty tree."""
+        self.root: KeyValues = {}
+
+    def iter_values(
+        self, tokens: Iterable[Token]
+    ) -> Iterator[Tuple[KeyPath, str, Value]]:
+        """Add tokens to tree and yield section path, key and value.
+
+        The tree is built while iterating, so a caller can stop as soon
+        as all values it needs have been yielded.
+        """
+        section, stack = self.root, []
+        path: KeyPath = ()
+        key = None
+        for kind, raw, start, end in tokens:
+            if kind == STRING:
+                text = _decode(raw) if b"\\" in raw else raw.decode(
+                    "utf-8", errors="replace"
+                )
+                if key is None:
+                    key = text
+                    continue
+                value = _new_value(Value, (text, start, end))
+                section[key] = value
+                yield path, key, value
+                key = None
+            elif kind == OPEN and key is not None:
+                stack.append(section)
+                section[key] = child = {}
+                section = child
+                path += (key,)
+                key = None
+            elif kind == CLOSE and key is None and stack:
+                section = stack.pop()
+                path = path[:-1]
+            else:
+                raise VdfSyntaxError(f"unexpected '{_decode(raw)}'", start)
+        if key is not None or stack:
+            raise VdfSyntaxError("unexpected end of data")
+
+
+def parse(data: bytes) -> KeyValues:
+    """Parse KeyValues data and return it as tree of nested dicts."""
+    parser = KeyValuesParser()
+    for _ in parser.iter_values(tokenize(data)):
+        pass
+    return parser.root
+
+
+def load(file: BinaryIO, chunk_size: int = 64 * 1024) -> KeyValues:
+    """Parse KeyValues file object by reading it in chunks."""
+    parser = KeyValuesParser()
+    chunks = iter(lambda: file.read(chunk_size), b"")
+    for _ in parser.iter_values(iter_tokens(chunks)):
+        pass
+    return parser.root
+
+
+def scan_keys(
+    data: bytes, section: str, keys: FrozenSet[str]
+) -> Optional[KeyValues]:
+    """Return values of keys at the top of section in data.
+
+    This is the fast path for the usual layout of appmanifests, where
+    the section starts the data and each key starts a line indented
+    by one tab with a quoted value in UTF-8 without escape sequences
+    before any nested section. None is returned for any other data,
+    which then has to be parsed.
+    """
+    section_pattern, pair_patterns = _scan_patterns(section, keys)
+    match = section_pattern.match(data)
+    if match is None:
+        return None
+    pos, endpos = match.span(1)
+    values: KeyValues = {}
+    try:
+        for key, pattern in pair_patterns:
+            match = pattern.search(data, pos, endpos)
+            if match is None:
+                return None
+            values[key] = _new_value(
+                Value, (match.group(1).decode(), *match.span(1))
+            )
+    except UnicodeDecodeError:
+        return None
+    return values
+
+
+@functools.lru_cache(maxsize=None)
+def _scan_patterns(
+    section: str, keys: FrozenSet[str]
+) -> Tuple[Pattern[bytes], Tuple[Tuple[str, Pattern[bytes]], ...]]:
+    """Return patterns for a scan of keys in section.
+
+    The section pattern captures the text up to the first nested
+    section. Each pair pattern starts with the literal line start of
+    its key, which lets the regex engine skip quickly to it.
+    """
+    section_pattern = re.compile(
+        rb'[ \t\r\n]*"' + re.escape(section.encode()) +
+        rb'"[ \t\r\n]*\{([^{]*)'
+    )
+    pair_patterns = tuple(
+        (key, re.compile(
+            rb'\n\t"' + re.escape(key.encode()) +
+            rb'"[ \t]*"([^"\\\n]*)"'
+        ))
+        for key in keys
+    )
+    return section_pattern, pair_patterns
+
+
+def encode(text: str) -> bytes:
+    """Return raw bytes of text with quotes and backslashes escaped."""
+    return text.replace("\\", "\\\\").replace('"', '\\"').encode()
+
+
+def _match_tokens(
+    buffer: bytes, base: int, final: bool
+) -> Iterator[Token]:
+    """Yield tokens in buffer and return position of first unused byte.
+
+    Unless final is set, a token touching the end of the buffer may be
+    incomplete and is kept for the next call.
+    """
+    if final and (tokens := _find_tokens(buffer, base)) is not None:
+        yield from tokens
+        return len(buffer)
+    pos, size = 0, len(buffer)
+    for match in TOKEN_PATTERN.finditer(buffer):
+        if match.start() != pos or (match.end() == size and not final):
+            break
+        pos = match.end()
+        group = match.lastindex
+        if group == 1:
+            break  # only skipped text until end of data
+        start, end = match.span(group)
+        if group == 2:
+            start, end = start + 1, end - 1
+        yield GROUP_KINDS[group], buffer[start:end], base + start, base + end
+    return pos
+
+
+def _find_tokens(buffer: bytes, base: int) -> Optional[List[Token]]:
+    """Return all tokens in buffer or None if buffer has invalid data.
+
+    This is the fast path for data that is complete. All matches are
+    collected at once and offsets are calculated from their lengths.
+    """
+    tokens, pos = [], 0
+    append = tokens.append
+    for skip, quoted, opening, closing, unquoted in TOKEN_PATTERN.findall(
+        buffer
+    ):
+        pos += len(skip)
+        if quoted:
+            end = pos + len(quoted)
+            append((STRING, quoted[1:-1], base + pos + 1, base + end - 1))
+            pos = end
+        elif opening or closing:
+            append((OPEN if opening else CLOSE, opening or closing,
+                    base + pos, base + pos + 1))
+            pos += 1
+        elif unquoted:
+            end = pos + len(unquoted)
+            append((STRING, unquoted, base + pos, base + end))
+            pos = end
+    if pos != len(buffer):
+        return None  # findall skipped data that doesn't form a token
+    return tokens
+
+
+def _decode(raw: bytes) -> str:
+    """Return text of raw token with escape sequences resolved."""
+    raw = ESCAPE_PATTERN.sub(
+        lambda match: ESCAPES.get(match.group(1), match.group(1)), raw
+    )
+    return raw.decode("utf-8", errors="replace")
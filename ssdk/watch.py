@@ -0,0 +1,172 @@
+##
+#   Copyright (c) 2021 Valentin Weber
+#
+#   This file is part of the software steam-scheduled-download-killer.
+#
+#   The software is licensed under the European Union Public License
+#   (EUPL) version 1.2 or later. You should have received a copy of
+#   the english license text with the software. For your rights and
+#   obligations under this license refer to the file LICENSE or visit
+#   https://joinup.ec.europa.eu/community/eupl/og_page/eupl to view
+#   official translations of the licence in another language of the EU.
+##
+
+"""Watchers reporting changed appmanifest files in Steam Libraries.
+
+If the optional package watchdog is installed, the watcher subscribes
+to file system events of each Steam Library Folder. Otherwise each
+folder is polled for changed modification times and sizes.
+"""
+
+import abc
+import os
+import queue
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+
+from .core.models import SteamLibrary
+from .core.utils import is_appmanifest
+
+
+class LibraryWatcher(abc.ABC):
+    """Base class for watchers of appmanifest files in Steam Libraries.
+
+    Changes are debounced: a batch of changed manifests is only reported
+    once no further change was seen for the given delay in seconds.
+    """
+
+    def __init__(self, libraries: List[SteamLibrary], delay: float) -> None:
+        """Initialize watcher for given libraries."""
+        self.libraries = libraries
+        self.delay = delay
+
+    def __enter__(self) -> "LibraryWatcher":
+        """Start watching the libraries."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop watching the libraries."""
+
+    @abc.abstractmethod
+    def wait(self) -> Set[str]:
+        """Block until manifests changed and return their paths."""
+
+    def batches(self) -> Iterator[List[str]]:
+        """Yield sorted lists of changed manifests indefinitely."""
+        while True:
+            changed = self.wait()
+            if changed:
+                yield sorted(changed)
+
+
+class PollingWatcher(LibraryWatcher):
+    """Watcher comparing stat results of manifests in each interval."""
+
+    def __init__(self, libraries: List[SteamLibrary], delay: float) -> None:
+        """Initialize watcher without a snapshot of manifests."""
+        super().__init__(libraries, delay)
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def __enter__(self) -> "PollingWatcher":
+        """Take first snapshot, so earlier writes aren't reported."""
+        self.snapshot = self.take_snapshot()
+        return self
+
+    def take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Return modification time and size for each manifest."""
+        snapshot = {}
+        for lib in self.libraries:
+            try:
+                with os.scandir(lib.path) as entries:
+                    for entry in entries:
+                        if not is_appmanifest(entry.name):
+                            continue
+                        stat = entry.stat()
+                        snapshot[entry.path] = stat.st_mtime_ns, stat.st_size
+            except OSError:
+                continue
+        return snapshot
+
+    def wait(self) -> Set[str]:
+        """Poll libraries until a batch of changes is complete."""
+        pending: Set[str] = set()
+        while True:
+            time.sleep(self.delay)
+            snapshot = self.take_snapshot()
+            changed = {
+                path for path, state in snapshot.items()
+                if self.snapshot.get(path) != state
+            }
+            self.snapshot = snapshot
+            if changed:
+                pending |= changed
+            elif pending:
+                return pending
+
+
+class EventWatcher(LibraryWatcher):
+    """Watcher receiving file system events through watchdog."""
+
+    def __init__(self, libraries: List[SteamLibrary], delay: float) -> None:
+        """Initialize watcher and schedule observer for each library."""
+        # watchdog is optional, install it with 'pip install watchdog'
+        # pylint: disable=import-outside-toplevel,import-error
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        super().__init__(libraries, delay)
+        self.events: "queue.Queue[str]" = queue.Queue()
+        events = self.events
+
+        class ManifestEventHandler(FileSystemEventHandler):
+            """Handler putting paths of changed manifests into queue."""
+
+            def on_any_event(self, event) -> None:
+                """Queue path of created, modified or moved manifest."""
+                path = getattr(event, "dest_path", "") or event.src_path
+                if not event.is_directory and is_appmanifest(
+                    os.path.basename(path)
+                ):
+                    events.put(path)
+
+        self.observer = Observer()
+        for lib in libraries:
+            if os.path.isdir(lib.path):
+                self.observer.schedule(ManifestEventHandler(), lib.path)
+
+    def __enter__(self) -> LibraryWatcher:
+        """Start observer thread or return started polling watcher.
+
+        Polling is used if a library can't be watched for events.
+        """
+        try:
+            self.observer.start()
+        except OSError:
+            self.observer.stop()
+            return PollingWatcher(self.libraries, self.delay).__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop observer thread if it was started."""
+        if self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
+
+    def wait(self) -> Set[str]:
+        """Wait for events until a batch of changes is complete."""
+        pending = {self.events.get()}
+        while True:
+            try:
+                pending.add(self.events.get(timeout=self.delay))
+            except queue.Empty:
+                return {path for path in pending if os.path.isfile(path)}
+
+
+def get_watcher(
+    libraries: List[SteamLibrary], delay: float
+) -> LibraryWatcher:
+    """Return event based watcher if available, else polling watcher."""
+    try:
+        return EventWatcher(libraries, delay)
+    except ImportError:
+        return PollingWatcher(libraries, delay)